@@ -0,0 +1,49 @@
+"""add_analytics_materialized_views
+
+Revision ID: 116294559ea8
+Revises: 7fe2fe27c198
+Create Date: 2026-10-14 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '116294559ea8'
+down_revision: Union[str, Sequence[str], None] = '7fe2fe27c198'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        CREATE MATERIALIZED VIEW mv_ratings_by_decade AS
+        SELECT (floor(extract(year FROM release_date) / 10) * 10)::int AS decade,
+               avg(rating) AS avg_rating,
+               count(*) AS movie_count
+        FROM movies
+        WHERE release_date IS NOT NULL
+        GROUP BY 1
+    """)
+    op.execute("CREATE UNIQUE INDEX ix_mv_ratings_by_decade ON mv_ratings_by_decade (decade)")
+    op.execute("""
+        CREATE MATERIALIZED VIEW mv_top_genres AS
+        SELECT (g->>'id')::int AS id, g->>'name' AS name, count(*) AS movie_count
+        FROM movies
+        CROSS JOIN LATERAL jsonb_array_elements(movies.genres) AS g
+        WHERE jsonb_typeof(movies.genres) = 'array'
+          AND g->>'id' IS NOT NULL
+          AND g->>'name' IS NOT NULL
+        GROUP BY 1, 2
+    """)
+    op.execute("CREATE UNIQUE INDEX ix_mv_top_genres ON mv_top_genres (id, name)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS mv_top_genres")
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS mv_ratings_by_decade")
@@ -0,0 +1,34 @@
+"""add_movies_trending_index
+
+Revision ID: 1bc6d27262e0
+Revises: 44027bd87477
+Create Date: 2026-10-14 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1bc6d27262e0'
+down_revision: Union[str, Sequence[str], None] = '44027bd87477'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Must match models.trending_score_expr exactly to be picked by the planner
+    op.create_index(
+        'ix_movies_trending',
+        'movies',
+        [sa.text('(coalesce(popularity, 0.0) * ln(coalesce(vote_count, 0) + 1)) DESC')],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_movies_trending', table_name='movies')
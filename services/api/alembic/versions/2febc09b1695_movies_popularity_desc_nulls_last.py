@@ -0,0 +1,35 @@
+"""movies_popularity_desc_nulls_last
+
+Revision ID: 2febc09b1695
+Revises: 1bc6d27262e0
+Create Date: 2026-10-14 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2febc09b1695'
+down_revision: Union[str, Sequence[str], None] = '1bc6d27262e0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.drop_index('ix_movies_popularity', table_name='movies')
+    op.create_index(
+        'ix_movies_popularity',
+        'movies',
+        [sa.text('popularity DESC NULLS LAST')],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_movies_popularity', table_name='movies')
+    op.create_index('ix_movies_popularity', 'movies', ['popularity'], unique=False)
@@ -0,0 +1,33 @@
+"""add_movies_pop_id_index
+
+Revision ID: 3953576a3cee
+Revises: 2febc09b1695
+Create Date: 2026-10-14 10:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3953576a3cee'
+down_revision: Union[str, Sequence[str], None] = '2febc09b1695'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        'ix_movies_pop_id',
+        'movies',
+        [sa.text('popularity DESC NULLS LAST'), sa.text('id DESC')],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_movies_pop_id', table_name='movies')
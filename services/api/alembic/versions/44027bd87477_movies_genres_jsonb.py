@@ -0,0 +1,52 @@
+"""movies_genres_jsonb
+
+Revision ID: 44027bd87477
+Revises: 5c10a2a62477
+Create Date: 2026-10-14 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '44027bd87477'
+down_revision: Union[str, Sequence[str], None] = '5c10a2a62477'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.alter_column(
+        'movies',
+        'genres',
+        existing_type=sa.JSON(),
+        type_=postgresql.JSONB(),
+        existing_nullable=True,
+        postgresql_using='genres::jsonb',
+    )
+    op.create_index(
+        'ix_movies_genres_gin',
+        'movies',
+        ['genres'],
+        unique=False,
+        postgresql_using='gin',
+        postgresql_ops={'genres': 'jsonb_path_ops'},
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_movies_genres_gin', table_name='movies')
+    op.alter_column(
+        'movies',
+        'genres',
+        existing_type=postgresql.JSONB(),
+        type_=sa.JSON(),
+        existing_nullable=True,
+        postgresql_using='genres::json',
+    )
@@ -0,0 +1,51 @@
+"""movies_trending_score_column
+
+Revision ID: 7fe2fe27c198
+Revises: 929c0a84ad72
+Create Date: 2026-10-14 11:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7fe2fe27c198'
+down_revision: Union[str, Sequence[str], None] = '929c0a84ad72'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'movies',
+        sa.Column(
+            'trending_score',
+            sa.Float(),
+            sa.Computed('coalesce(popularity, 0.0) * ln(coalesce(vote_count, 0) + 1)', persisted=True),
+            nullable=True,
+        ),
+    )
+    op.create_index(
+        'ix_movies_trending_score',
+        'movies',
+        [sa.text('trending_score DESC NULLS LAST')],
+        unique=False,
+    )
+    # Superseded by ix_movies_trending_score
+    op.drop_index('ix_movies_trending', table_name='movies')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(
+        'ix_movies_trending',
+        'movies',
+        [sa.text('(coalesce(popularity, 0.0) * ln(coalesce(vote_count, 0) + 1)) DESC')],
+        unique=False,
+    )
+    op.drop_index('ix_movies_trending_score', table_name='movies')
+    op.drop_column('movies', 'trending_score')
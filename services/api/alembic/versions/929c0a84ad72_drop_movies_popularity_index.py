@@ -0,0 +1,34 @@
+"""drop_movies_popularity_index
+
+Revision ID: 929c0a84ad72
+Revises: 3953576a3cee
+Create Date: 2026-10-14 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '929c0a84ad72'
+down_revision: Union[str, Sequence[str], None] = '3953576a3cee'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ix_movies_pop_id (popularity DESC NULLS LAST, id DESC) covers the same scans
+    op.drop_index('ix_movies_popularity', table_name='movies')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(
+        'ix_movies_popularity',
+        'movies',
+        [sa.text('popularity DESC NULLS LAST')],
+        unique=False,
+    )
@@ -0,0 +1,29 @@
+"""add_movies_updated_at_index
+
+Revision ID: b4d1e7a90c35
+Revises: ddcc4f03b269
+Create Date: 2026-10-14 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4d1e7a90c35'
+down_revision: Union[str, Sequence[str], None] = 'ddcc4f03b269'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Delta search indexing scans movies by updated_at
+    op.create_index('ix_movies_updated_at', 'movies', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_movies_updated_at', table_name='movies')
@@ -0,0 +1,30 @@
+"""movies_details_fetched_at
+
+Revision ID: c8e2f4a61d07
+Revises: b4d1e7a90c35
+Create Date: 2026-10-14 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8e2f4a61d07'
+down_revision: Union[str, Sequence[str], None] = 'b4d1e7a90c35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Left NULL for existing rows: updated_at cannot tell when details were fetched,
+    # so each movie's details are refetched once on its next detail-fetching ingest
+    op.add_column('movies', sa.Column('details_fetched_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('movies', 'details_fetched_at')
@@ -0,0 +1,35 @@
+"""add_movies_underrated_index
+
+Revision ID: ddcc4f03b269
+Revises: e3a8b3a169bf
+Create Date: 2026-10-14 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ddcc4f03b269'
+down_revision: Union[str, Sequence[str], None] = 'e3a8b3a169bf'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Partial index covering compute.update_underrated's filter; the predicate keeps it small
+    op.create_index(
+        'ix_movies_underrated',
+        'movies',
+        ['rating', 'popularity', 'vote_count'],
+        unique=False,
+        postgresql_where=sa.text('rating >= 7.5'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_movies_underrated', table_name='movies')
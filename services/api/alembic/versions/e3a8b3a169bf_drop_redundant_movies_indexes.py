@@ -0,0 +1,33 @@
+"""drop_redundant_movies_indexes
+
+Revision ID: e3a8b3a169bf
+Revises: 116294559ea8
+Create Date: 2026-10-14 12:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a8b3a169bf'
+down_revision: Union[str, Sequence[str], None] = '116294559ea8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # movies_pkey already indexes id; title and genre are never filtered on
+    op.drop_index(op.f('ix_movies_id'), table_name='movies')
+    op.drop_index(op.f('ix_movies_title'), table_name='movies')
+    op.drop_index(op.f('ix_movies_genre'), table_name='movies')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(op.f('ix_movies_genre'), 'movies', ['genre'], unique=False)
+    op.create_index(op.f('ix_movies_title'), 'movies', ['title'], unique=False)
+    op.create_index(op.f('ix_movies_id'), 'movies', ['id'], unique=False)
@@ -1,10 +1,17 @@
+import atexit
+import hashlib
+import inspect
 import os
-import json
+import orjson
 import redis
 from typing import Optional, Any, Callable
 from functools import wraps
-from datetime import date, datetime
 from dotenv import load_dotenv
+from fastapi import Request
+from fastapi.responses import Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from .responses import RawJSONResponse, dumps_json
 
 load_dotenv()
 
@@ -17,48 +24,65 @@ def get_redis_client() -> redis.Redis:
     global _redis_client
     if _redis_client is None:
         redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
-        _redis_client = redis.from_url(redis_url, decode_responses=True)
+        # Bounded pool: the redis-py default allows 2**31 connections per process
+        pool = redis.ConnectionPool.from_url(
+            redis_url,
+            max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", "50")),
+            socket_keepalive=True,
+            socket_timeout=2,
+            health_check_interval=30,
+            # Values are orjson bytes; skip the client-side UTF-8 decode
+            decode_responses=False,
+        )
+        atexit.register(pool.disconnect)
+        _redis_client = redis.Redis(connection_pool=pool)
     return _redis_client
 
 
 def cache_key(prefix: str, *args, **kwargs) -> str:
-    parts = [prefix]
-    for arg in args:
-        if arg is not None:
-            if isinstance(arg, date):
-                parts.append(str(arg))
-            elif isinstance(arg, datetime):
-                parts.append(arg.isoformat())
-            else:
-                parts.append(str(arg))
-    
-    if kwargs:
-        sorted_kwargs = sorted(kwargs.items())
-        kw_parts = [f"{k}:{v}" for k, v in sorted_kwargs if v is not None]
-        if kw_parts:
-            parts.extend(kw_parts)
-    
-    return ":".join(parts)
+    """prefix:<hash of the arguments>; hashing their JSON keeps free-text values (search q) from colliding"""
+    # Skip injected DB sessions and requests; they are not part of the cached result identity
+    skip = (Session, AsyncSession, Request)
+    params = [arg for arg in args if arg is not None and not isinstance(arg, skip)]
+    named = {k: v for k, v in kwargs.items() if v is not None and not isinstance(v, skip)}
+    if not params and not named:
+        return prefix
+    encoded = orjson.dumps([params, named], default=str, option=orjson.OPT_SORT_KEYS)
+    return f"{prefix}:{hashlib.sha256(encoded).hexdigest()[:16]}"
+
+
+def get_raw_from_cache(key: str) -> Optional[bytes]:
+    try:
+        client = get_redis_client()
+        return client.get(key) or None
+    except Exception:
+        return None
 
 
 def get_from_cache(key: str) -> Optional[Any]:
+    value = get_raw_from_cache(key)
+    if value:
+        try:
+            return orjson.loads(value)
+        except Exception:
+            pass
+    return None
+
+
+def set_raw_in_cache(key: str, serialized: bytes, ttl: int = 3600) -> bool:
     try:
         client = get_redis_client()
-        value = client.get(key)
-        if value:
-            return json.loads(value)
+        return client.setex(key, ttl, serialized)
     except Exception:
-        pass
-    return None
+        return False
 
 
 def set_in_cache(key: str, value: Any, ttl: int = 3600) -> bool:
     try:
-        client = get_redis_client()
-        serialized = json.dumps(value)
-        return client.setex(key, ttl, serialized)
+        serialized = dumps_json(value)
     except Exception:
         return False
+    return set_raw_in_cache(key, serialized, ttl)
 
 
 def delete_from_cache(key: str) -> bool:
@@ -70,16 +94,51 @@ def delete_from_cache(key: str) -> bool:
         return False
 
 
+def delete_pattern_from_cache(pattern: str) -> int:
+    """Delete every key matching a glob pattern, e.g. "analytics:*" """
+    try:
+        client = get_redis_client()
+        deleted = 0
+        batch = []
+        for key in client.scan_iter(match=pattern, count=500):
+            batch.append(key)
+            if len(batch) >= 500:
+                deleted += client.delete(*batch)
+                batch = []
+        if batch:
+            deleted += client.delete(*batch)
+        return deleted
+    except Exception:
+        return 0
+
+
 def cached(ttl: int = 3600, key_prefix: Optional[str] = None):
     def decorator(func: Callable):
         prefix = key_prefix or func.__name__
         
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                key = cache_key(prefix, *args, **kwargs)
+                cached_value = get_from_cache(key)
+                if cached_value is not None:
+                    record_cache_hit()
+                    return cached_value
+                record_cache_miss()
+                result = await func(*args, **kwargs)
+                set_in_cache(key, result, ttl)
+                return result
+            
+            return async_wrapper
+        
         @wraps(func)
         def wrapper(*args, **kwargs):
             key = cache_key(prefix, *args, **kwargs)
             cached_value = get_from_cache(key)
             if cached_value is not None:
+                record_cache_hit()
                 return cached_value
+            record_cache_miss()
             result = func(*args, **kwargs)
             set_in_cache(key, result, ttl)
             return result
@@ -88,6 +147,60 @@ def cached(ttl: int = 3600, key_prefix: Optional[str] = None):
     return decorator
 
 
+def body_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+
+
+def cached_json(ttl: int = 3600, key_prefix: Optional[str] = None, etag: bool = False):
+    """Like cached(), for routes: stores the serialized body and serves hits as
+    raw bytes, so cached responses skip the JSON decode/encode.
+    
+    With etag=True the route must take a ``request: Request`` argument; responses
+    carry an ETag and a matching If-None-Match gets an empty 304."""
+    def decorator(func: Callable):
+        prefix = key_prefix or func.__name__
+        
+        def respond(body: bytes, request: Optional[Request]) -> Response:
+            if not etag:
+                return RawJSONResponse(body)
+            tag = body_etag(body)
+            if request is not None and request.headers.get("if-none-match") == tag:
+                return Response(status_code=304, headers={"ETag": tag})
+            return RawJSONResponse(body, headers={"ETag": tag})
+        
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                key = cache_key(prefix, *args, **kwargs)
+                request = kwargs.get("request")
+                cached_body = get_raw_from_cache(key)
+                if cached_body is not None:
+                    record_cache_hit()
+                    return respond(cached_body, request)
+                record_cache_miss()
+                body = dumps_json(await func(*args, **kwargs))
+                set_raw_in_cache(key, body, ttl)
+                return respond(body, request)
+            
+            return async_wrapper
+        
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = cache_key(prefix, *args, **kwargs)
+            request = kwargs.get("request")
+            cached_body = get_raw_from_cache(key)
+            if cached_body is not None:
+                record_cache_hit()
+                return respond(cached_body, request)
+            record_cache_miss()
+            body = dumps_json(func(*args, **kwargs))
+            set_raw_in_cache(key, body, ttl)
+            return respond(body, request)
+        
+        return wrapper
+    return decorator
+
+
 _cache_stats = {"hits": 0, "misses": 0}
 
 
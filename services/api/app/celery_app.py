@@ -0,0 +1,24 @@
+"""
+Celery client used by the API to enqueue and inspect worker jobs
+"""
+import os
+from celery import Celery
+from dotenv import load_dotenv
+from .serializers import register_orjson_serializer
+
+load_dotenv()
+register_orjson_serializer()
+
+# One instance (and one broker connection pool) shared by every router
+celery_app = Celery(
+    "moviemetric_api",
+    broker=os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0"),
+    backend=os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/1"),
+)
+
+# Must match the worker: tasks go out as orjson, results may come back as orjson or json
+celery_app.conf.update(
+    task_serializer="orjson",
+    result_serializer="orjson",
+    accept_content=["orjson", "json"],
+)
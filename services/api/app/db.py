@@ -1,8 +1,12 @@
 import os
+from contextlib import contextmanager
 
+import orjson
 from dotenv import load_dotenv
 
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
 from sqlalchemy.orm import sessionmaker, declarative_base
 
@@ -10,16 +14,58 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+
+def json_serializer(value) -> str:
+    """orjson for JSON/JSONB columns (e.g. recommendations_json); int keys become strings like stdlib json"""
+    return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
 # Create engine with connection pool settings
 engine = create_engine(
     DATABASE_URL,
     future=True,
     pool_pre_ping=True,  # Verify connections before using
     pool_size=10,  # Number of connections to maintain
-    max_overflow=20  # Maximum overflow connections
+    max_overflow=20,  # Maximum overflow connections
+    json_serializer=json_serializer,
+    json_deserializer=orjson.loads,
 )
 
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False, future=True)
 
+
+@contextmanager
+def session_scope():
+    """Sync session for worker tasks, closed however the block exits"""
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def to_async_url(url):
+    """Same database, asyncpg driver (postgresql[+psycopg2]://... -> postgresql+asyncpg://...)"""
+    return make_url(url).set(drivername="postgresql+asyncpg")
+
+
+# Async engine for the read-only API routes; the worker keeps using the sync engine
+async_engine = create_async_engine(
+    to_async_url(DATABASE_URL),
+    pool_pre_ping=True,
+    pool_size=20,  # Sized for concurrent requests sharing one event loop
+    max_overflow=30,
+    pool_recycle=300,  # Retire connections before proxies/idle timeouts drop them
+    json_serializer=json_serializer,
+    json_deserializer=orjson.loads,
+    connect_args={
+        # Hot routes repeat a handful of statements; keep them prepared per connection
+        "prepared_statement_cache_size": 256,
+        "statement_cache_size": 1024,
+    },
+)
+
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
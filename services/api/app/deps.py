@@ -1,6 +1,7 @@
-from typing import Generator
+from typing import AsyncGenerator, Generator
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from .db import SessionLocal
+from .db import AsyncSessionLocal, SessionLocal
 
 
 def get_db() -> Generator[Session, None, None]:
@@ -31,3 +32,21 @@ def get_db() -> Generator[Session, None, None]:
     finally:
         db.close()
 
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Async database session dependency for FastAPI.
+    
+    Use from `async def` route handlers so database waits do not hold a
+    threadpool slot.
+    
+    Usage:
+        @router.get("/endpoint")
+        async def my_endpoint(db: AsyncSession = Depends(get_async_db)):
+            result = await db.execute(select(Movie))
+    
+    Yields:
+        AsyncSession: SQLAlchemy async database session
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
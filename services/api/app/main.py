@@ -2,6 +2,7 @@ from fastapi import FastAPI
 
 from .routers import movies, analytics, admin, search, health, metrics
 from .middleware import PerformanceMiddleware
+from .responses import ORJSONResponse
 
 app = FastAPI(
     title="MovieMetric",
@@ -9,6 +10,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
 )
 
 # Add performance monitoring middleware
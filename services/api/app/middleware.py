@@ -1,13 +1,61 @@
 import time
-import statistics
-from typing import Callable, List, Optional
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from bisect import bisect_left
+from typing import Optional
+import numpy as np
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from .cache import record_cache_hit, record_cache_miss, get_cache_stats
 
 
-_latency_data: dict[str, List[float]] = {}
+# Log-spaced latency bucket upper edges in ms (0.1ms .. 60s); one extra overflow bucket
+N_BUCKETS = 128
+BUCKET_EDGES = np.logspace(np.log10(0.1), np.log10(60000), N_BUCKETS)
+_BUCKET_EDGES_LIST = BUCKET_EDGES.tolist()
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram: O(1) record, O(buckets) percentiles"""
+    
+    __slots__ = ("buckets", "count", "total", "min", "max")
+    
+    def __init__(self):
+        self.buckets = np.zeros(N_BUCKETS + 1, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+    
+    def record(self, latency_ms: float):
+        self.buckets[bisect_left(_BUCKET_EDGES_LIST, latency_ms)] += 1
+        self.count += 1
+        self.total += latency_ms
+        if latency_ms < self.min:
+            self.min = latency_ms
+        if latency_ms > self.max:
+            self.max = latency_ms
+    
+    def merge(self, other: "LatencyHistogram"):
+        self.buckets += other.buckets
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+    
+    def percentile(self, q: float) -> float:
+        """Upper edge of the bucket holding the q-th ranked sample, clamped to [min, max]"""
+        rank = int(self.count * q) + 1
+        idx = int(np.searchsorted(np.cumsum(self.buckets), rank))
+        upper = _BUCKET_EDGES_LIST[idx] if idx < N_BUCKETS else self.max
+        return min(max(upper, self.min), self.max)
+
+
+# Only API traffic is timed; a single tuple startswith keeps the check in C
+TRACKED_PREFIXES = ("/movies", "/analytics", "/search")
+
+_latency_data: dict[str, LatencyHistogram] = {}
+
+# Bumped on every recorded request; lets /metrics reuse stats when nothing changed
+_stats_version = 0
+_endpoint_stats_cache: dict = {"version": -1, "stats": {}}
 
 
 def _increment_request_count(endpoint: str):
@@ -18,47 +66,56 @@ def _increment_request_count(endpoint: str):
         pass
 
 
-class PerformanceMiddleware(BaseHTTPMiddleware):
+class PerformanceMiddleware:
+    """Pure ASGI middleware: times API requests and stamps latency/cache headers"""
+    
     def __init__(self, app: ASGIApp):
-        super().__init__(app)
+        self.app = app
     
-    async def dispatch(self, request: Request, call_next: Callable):
-        if not request.url.path.startswith("/movies") and \
-           not request.url.path.startswith("/analytics") and \
-           not request.url.path.startswith("/search"):
-            return await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not scope["path"].startswith(TRACKED_PREFIXES):
+            await self.app(scope, receive, send)
+            return
         
-        start_time = time.time()
-        request.state.cache_hit = False
-        response = await call_next(request)
-        latency_ms = (time.time() - start_time) * 1000
+        start_time = time.perf_counter()
+        endpoint = scope["path"]
+        # Same dict Starlette exposes as request.state
+        state = scope.setdefault("state", {})
+        state["cache_hit"] = False
         
-        endpoint = request.url.path.split("?")[0]
-        if endpoint not in _latency_data:
-            _latency_data[endpoint] = []
-        _latency_data[endpoint].append(latency_ms)
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                latency_ms = (time.perf_counter() - start_time) * 1000
+                _record_latency(endpoint, latency_ms)
+                
+                headers = list(message.get("headers", []))
+                headers.append((b"x-response-time-ms", f"{latency_ms:.2f}".encode()))
+                headers.append((b"x-cache-status", b"HIT" if state.get("cache_hit") else b"MISS"))
+                message["headers"] = headers
+            await send(message)
         
+        await self.app(scope, receive, send_wrapper)
         _increment_request_count(endpoint)
-        
-        if len(_latency_data[endpoint]) > 1000:
-            _latency_data[endpoint] = _latency_data[endpoint][-1000:]
-        
-        response.headers["X-Response-Time-Ms"] = f"{latency_ms:.2f}"
-        if hasattr(request.state, "cache_hit"):
-            response.headers["X-Cache-Status"] = "HIT" if request.state.cache_hit else "MISS"
-        
-        return response
+
+
+def _record_latency(endpoint: str, latency_ms: float):
+    global _stats_version
+    _stats_version += 1
+    hist = _latency_data.get(endpoint)
+    if hist is None:
+        hist = _latency_data[endpoint] = LatencyHistogram()
+    hist.record(latency_ms)
 
 
 def get_latency_stats(endpoint: Optional[str] = None) -> dict:
     if endpoint:
-        latencies = _latency_data.get(endpoint, [])
+        hist = _latency_data.get(endpoint)
     else:
-        latencies = []
-        for endpoint_latencies in _latency_data.values():
-            latencies.extend(endpoint_latencies)
+        hist = LatencyHistogram()
+        for endpoint_hist in list(_latency_data.values()):
+            hist.merge(endpoint_hist)
     
-    if not latencies:
+    if hist is None or not hist.count:
         return {
             "count": 0,
             "avg": 0,
@@ -68,19 +125,20 @@ def get_latency_stats(endpoint: Optional[str] = None) -> dict:
             "max": 0,
         }
     
-    sorted_latencies = sorted(latencies)
-    count = len(sorted_latencies)
-    
     return {
-        "count": count,
-        "avg": round(statistics.mean(sorted_latencies), 2),
-        "p50": round(sorted_latencies[int(count * 0.5)], 2),
-        "p95": round(sorted_latencies[int(count * 0.95)], 2),
-        "min": round(min(sorted_latencies), 2),
-        "max": round(max(sorted_latencies), 2),
+        "count": hist.count,
+        "avg": round(hist.total / hist.count, 2),
+        "p50": round(hist.percentile(0.5), 2),
+        "p95": round(hist.percentile(0.95), 2),
+        "min": round(hist.min, 2),
+        "max": round(hist.max, 2),
     }
 
 
 def get_all_endpoint_stats() -> dict:
-    return {endpoint: get_latency_stats(endpoint) for endpoint in _latency_data.keys()}
+    version = _stats_version
+    if _endpoint_stats_cache["version"] != version:
+        _endpoint_stats_cache["stats"] = {endpoint: get_latency_stats(endpoint) for endpoint in list(_latency_data.keys())}
+        _endpoint_stats_cache["version"] = version
+    return _endpoint_stats_cache["stats"]
 
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, BigInteger, String, Float, Date, DateTime, Text, Boolean, JSON, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Date, DateTime, Text, Boolean, JSON, ForeignKey, UniqueConstraint, Index, Computed, DDL, event
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 from .db import Base
 
@@ -6,15 +7,15 @@ from .db import Base
 class Movie(Base):
     __tablename__ = "movies"
 
-    id = Column(Integer, primary_key=True, index=True)
-    title = Column(String, nullable=False, index=True)
+    id = Column(Integer, primary_key=True)
+    title = Column(String, nullable=False)
     overview = Column(Text, nullable=True)
     release_date = Column(Date, nullable=True, index=True)
-    genre = Column(String, nullable=True, index=True)  # Can be comma-separated or JSON
-    genres = Column(JSON, nullable=True)  # Array of genre objects
+    genre = Column(String, nullable=True)  # Can be comma-separated or JSON
+    genres = Column(JSONB(none_as_null=True), nullable=True)  # Array of genre objects
     rating = Column(Float, nullable=True, index=True)  # Average rating
     vote_count = Column(Integer, default=0)  # Number of votes
-    popularity = Column(Float, nullable=True, index=True)  # For trending
+    popularity = Column(Float, nullable=True)  # For trending
     poster_path = Column(String, nullable=True)
     backdrop_path = Column(String, nullable=True)
     runtime = Column(Integer, nullable=True)  # Duration in minutes
@@ -22,10 +23,64 @@ class Movie(Base):
     revenue = Column(BigInteger, nullable=True)  # Changed to BigInteger for large values
     tagline = Column(String, nullable=True)
     status = Column(String, nullable=True)  # Released, Post Production, etc.
+    # Score used to rank /movies/trending, maintained by PostgreSQL on write
+    trending_score = Column(
+        Float,
+        Computed("coalesce(popularity, 0.0) * ln(coalesce(vote_count, 0) + 1)", persisted=True),
+    )
     is_trending = Column(Boolean, default=False, index=True)
     is_underrated = Column(Boolean, default=False, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # When runtime/budget/revenue/tagline/status were last fetched from TMDB
+    details_fetched_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Serves ORDER BY popularity DESC NULLS LAST (leading column) and keyset pagination on (popularity, id)
+        Index("ix_movies_pop_id", popularity.desc().nullslast(), id.desc()),
+        Index("ix_movies_trending_score", trending_score.desc().nullslast()),
+        # compute.update_underrated: rating >= 7.5 AND popularity < 30 AND vote_count >= 100
+        Index("ix_movies_underrated", rating, popularity, vote_count, postgresql_where=rating >= 7.5),
+        # Backs containment filters on genres (genres @> '[{"id": 28}]')
+        Index("ix_movies_genres_gin", "genres", postgresql_using="gin", postgresql_ops={"genres": "jsonb_path_ops"}),
+        # search.update_index reads only rows changed since its last run
+        Index("ix_movies_updated_at", updated_at),
+    )
+
+
+# Analytics materialized views over movies: name -> (query, unique index columns).
+# The unique indexes are what allow REFRESH MATERIALIZED VIEW CONCURRENTLY.
+ANALYTICS_VIEWS = {
+    "mv_ratings_by_decade": (
+        """
+        SELECT (floor(extract(year FROM release_date) / 10) * 10)::int AS decade,
+               avg(rating) AS avg_rating,
+               count(*) AS movie_count
+        FROM movies
+        WHERE release_date IS NOT NULL
+        GROUP BY 1
+        """,
+        "decade",
+    ),
+    "mv_top_genres": (
+        """
+        SELECT (g->>'id')::int AS id, g->>'name' AS name, count(*) AS movie_count
+        FROM movies
+        CROSS JOIN LATERAL jsonb_array_elements(movies.genres) AS g
+        WHERE jsonb_typeof(movies.genres) = 'array'
+          AND g->>'id' IS NOT NULL
+          AND g->>'name' IS NOT NULL
+        GROUP BY 1, 2
+        """,
+        "id, name",
+    ),
+}
+
+# Keep metadata.create_all()/drop_all() in step with the migrations
+for _name, (_query, _unique_cols) in ANALYTICS_VIEWS.items():
+    event.listen(Movie.__table__, "after_create", DDL(f"CREATE MATERIALIZED VIEW {_name} AS {_query}"))
+    event.listen(Movie.__table__, "after_create", DDL(f"CREATE UNIQUE INDEX ix_{_name} ON {_name} ({_unique_cols})"))
+    event.listen(Movie.__table__, "before_drop", DDL(f"DROP MATERIALIZED VIEW IF EXISTS {_name}"))
 
 
 class MovieTrendingDaily(Base):
@@ -0,0 +1,29 @@
+from typing import Any
+import orjson
+from fastapi.responses import JSONResponse, Response
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NAIVE_UTC
+
+
+def _json_default(value: Any) -> Any:
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps_json(content: Any) -> bytes:
+    """Serialize the way API responses and cache entries share (native date/datetime/numpy support)"""
+    return orjson.dumps(content, default=_json_default, option=ORJSON_OPTIONS)
+
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
+
+
+class RawJSONResponse(Response):
+    """Already-serialized JSON bytes, sent as-is"""
+
+    media_type = "application/json"
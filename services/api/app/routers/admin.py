@@ -1,18 +1,10 @@
-import os
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional
-from celery import Celery
+from celery import group
 from celery.result import AsyncResult
-from dotenv import load_dotenv
+from ..celery_app import celery_app
 
-load_dotenv()
-
-celery_app = Celery(
-    "moviemetric_api",
-    broker=os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0"),
-    backend=os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/1"),
-)
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -128,7 +120,11 @@ def trigger_compute_ratings_by_decade():
 @router.post("/compute/recommendations", response_model=IngestResponse)
 def trigger_compute_recommendations(movie_id: int = None):
     try:
-        task = celery_app.send_task("compute.recommendations", args=[movie_id] if movie_id else [])
+        if movie_id:
+            task = celery_app.send_task("compute.recommendations", args=[movie_id])
+        else:
+            # Sharded across workers instead of one long task over every movie
+            task = celery_app.send_task("compute.recommendations_dispatch")
         
         return IngestResponse(
             status="enqueued",
@@ -159,6 +155,32 @@ def trigger_compute_all():
         )
 
 
+# Cold-start set of compute jobs; /compute/batch publishes them together over one broker connection
+BATCH_COMPUTE_TASKS = (
+    "compute.trending",
+    "compute.genre_stats",
+    "compute.ratings_by_decade",
+    "compute.recommendations_dispatch",
+)
+
+
+@router.post("/compute/batch", response_model=IngestResponse)
+def trigger_compute_batch():
+    try:
+        job = group([celery_app.signature(name) for name in BATCH_COMPUTE_TASKS]).apply_async()
+        
+        return IngestResponse(
+            status="enqueued",
+            task_id=job.id,
+            message=f"Compute batch enqueued: {', '.join(BATCH_COMPUTE_TASKS)}"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to enqueue compute batch: {str(e)}"
+        )
+
+
 @router.post("/search/build-index", response_model=IngestResponse)
 def trigger_build_search_index():
     try:
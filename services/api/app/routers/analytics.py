@@ -1,21 +1,39 @@
 from datetime import date
 from typing import List, Optional
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy import desc
-from sqlalchemy.orm import Session
-from ..deps import get_db
-from ..models import Movie, GenreStatsDaily, RatingsByDecade
+from fastapi import APIRouter, Depends, Query, Request
+from sqlalchemy import desc, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..cache import cached_json
+from ..deps import get_async_db
+from ..models import GenreStatsDaily, RatingsByDecade
 from ..schemas import TopGenreOut, RatingsByDecadeOut, MessageResponse
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
+# Fallbacks read the materialized views refreshed after each ingest (see models.ANALYTICS_VIEWS)
+TOP_GENRES_SQL = text("""
+    SELECT id, name, movie_count
+    FROM mv_top_genres
+    ORDER BY movie_count DESC
+    LIMIT 20
+""")
+
+RATINGS_BY_DECADE_SQL = text("""
+    SELECT decade, coalesce(avg_rating, 0) AS avg_rating, movie_count
+    FROM mv_ratings_by_decade
+    ORDER BY decade
+""")
+
 @router.get("/ping", response_model=MessageResponse)
 def ping():
     return {"ok": True}
 
+# Rows already have the response shape: cached_json serializes them once and
+# serves cache hits as stored bytes. response_model only documents the shape.
 @router.get("/top-genres", response_model=List[TopGenreOut])
-def top_genres(
-    db: Session = Depends(get_db),
+@cached_json(ttl=3600, key_prefix="analytics:top_genres")
+async def top_genres(
+    db: AsyncSession = Depends(get_async_db),
     target_date: Optional[str] = Query(None, description="Date in YYYY-MM-DD format. Defaults to latest available.")
 ):
     if target_date:
@@ -26,93 +44,42 @@ def top_genres(
     else:
         query_date = None
     
-    if query_date:
-        # Get stats for specific date
-        stats = db.query(GenreStatsDaily).filter(
-            GenreStatsDaily.date == query_date
-        ).order_by(desc(GenreStatsDaily.volume)).limit(20).all()
-    else:
-        # Get latest date's stats
-        latest_date = db.query(GenreStatsDaily.date).order_by(
-            desc(GenreStatsDaily.date)
-        ).first()
+    if query_date is None:
+        # Latest date's stats
+        query_date = (await db.execute(select(func.max(GenreStatsDaily.date)))).scalar()
         
-        if latest_date:
-            stats = db.query(GenreStatsDaily).filter(
-                GenreStatsDaily.date == latest_date[0]
-            ).order_by(desc(GenreStatsDaily.volume)).limit(20).all()
-        else:
-            # Fallback: compute on the fly if no precomputed data
-            from collections import Counter
-            movies = db.query(Movie).all()
-            genre_counter = Counter()
-            genre_map = {}
-            
-            for movie in movies:
-                if movie.genres and isinstance(movie.genres, list):
-                    for genre in movie.genres:
-                        if isinstance(genre, dict):
-                            genre_id = genre.get("id")
-                            genre_name = genre.get("name")
-                            if genre_id and genre_name:
-                                genre_counter[genre_id] += 1
-                                genre_map[genre_id] = genre_name
-            
-            top_genres = genre_counter.most_common(20)
-            return [
-                TopGenreOut(
-                    id=genre_id,
-                    name=genre_map.get(genre_id, f"Genre {genre_id}"),
-                    movie_count=count
-                )
-                for genre_id, count in top_genres
-            ]
+        if query_date is None:
+            # Fallback: no daily stats yet, read the materialized view
+            rows = (await db.execute(TOP_GENRES_SQL)).mappings().all()
+            return [dict(row) for row in rows]
     
-    return [
-        TopGenreOut(
-            id=stat.genre_id,
-            name=stat.genre_name,
-            movie_count=stat.volume
+    rows = (await db.execute(
+        select(
+            GenreStatsDaily.genre_id.label("id"),
+            GenreStatsDaily.genre_name.label("name"),
+            GenreStatsDaily.volume.label("movie_count"),
         )
-        for stat in stats
-    ]
+        .where(GenreStatsDaily.date == query_date)
+        .order_by(desc(GenreStatsDaily.volume))
+        .limit(20)
+    )).mappings().all()
+    return [dict(row) for row in rows]
 
 @router.get("/ratings-by-decade", response_model=List[RatingsByDecadeOut])
-def ratings_by_decade(db: Session = Depends(get_db)):
-    rows = db.query(RatingsByDecade).order_by(RatingsByDecade.decade).all()
+# Short TTL: clients revalidate with If-None-Match and get a bodiless 304 while unchanged
+@cached_json(ttl=300, key_prefix="analytics:ratings_by_decade", etag=True)
+async def ratings_by_decade(request: Request, db: AsyncSession = Depends(get_async_db)):
+    rows = (await db.execute(
+        select(
+            RatingsByDecade.decade,
+            func.coalesce(RatingsByDecade.avg_rating, 0.0).label("avg_rating"),
+            RatingsByDecade.movie_count,
+        )
+        .order_by(RatingsByDecade.decade)
+    )).mappings().all()
     
     if not rows:
-        # Fallback: compute on the fly if no precomputed data
-        from sqlalchemy import extract, func
-        from ..models import Movie
-        
-        computed_rows = (
-            db.query(
-                (func.floor(extract("year", Movie.release_date) / 10) * 10).label("decade"),
-                func.avg(Movie.rating).label("avg_rating"),
-                func.count(Movie.id).label("movie_count"),
-            )
-            .filter(Movie.release_date.isnot(None))
-            .group_by("decade")
-            .order_by("decade")
-            .all()
-        )
-        
-        return [
-            RatingsByDecadeOut(
-                decade=int(r.decade),
-                avg_rating=float(r.avg_rating or 0),
-                movie_count=r.movie_count
-            )
-            for r in computed_rows
-        ]
+        # Fallback: no precomputed rows yet, read the materialized view
+        rows = (await db.execute(RATINGS_BY_DECADE_SQL)).mappings().all()
     
-    return [
-        RatingsByDecadeOut(
-            decade=row.decade,
-            avg_rating=float(row.avg_rating or 0),
-            movie_count=row.movie_count
-        )
-        for row in rows
-    ]
-
+    return [dict(row) for row in rows]
@@ -1,25 +1,23 @@
 import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import APIRouter
 from pydantic import BaseModel
 from typing import Dict, Optional, List, Any
 from datetime import datetime
 from celery.result import AsyncResult
-from celery import Celery
 from dotenv import load_dotenv
 from ..middleware import get_latency_stats, get_all_endpoint_stats
-from ..cache import get_cache_stats
+from ..cache import get_cache_stats, get_redis_client
+from ..celery_app import celery_app
+from ..responses import ORJSONResponse
 
 load_dotenv()
 
 router = APIRouter(prefix="/metrics", tags=["metrics"])
 
-# Celery app for querying job information
-celery_app = Celery(
-    "moviemetric_api",
-    broker=os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0"),
-    backend=os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/1"),
-)
-
 
 class MetricsResponse(BaseModel):
     requests: Dict[str, Any]
@@ -28,45 +26,79 @@ class MetricsResponse(BaseModel):
     jobs: Dict[str, Any]
 
 
-_request_counts: Dict[str, int] = {}
+# Only updated from the ASGI middleware, i.e. on the event loop thread
+_request_counts: Counter = Counter()
+_total_requests = 0
 
 
 def increment_request_count(endpoint: str):
-    _request_counts[endpoint] = _request_counts.get(endpoint, 0) + 1
+    global _total_requests
+    _request_counts[endpoint] += 1
+    _total_requests += 1
 
 
 def get_request_counts() -> Dict[str, int]:
-    return _request_counts.copy()
+    return dict(_request_counts)
 
 
 def get_total_request_count() -> int:
-    return sum(_request_counts.values())
+    return _total_requests
+
+
+# Inspect broadcasts are slow (each waits out its reply timeout); /metrics is polled, so brief staleness is fine
+JOB_METRICS_TTL = 2.0
+# Workers on the same broker answer well within this; the default of 1s is mostly spent waiting
+INSPECT_TIMEOUT = float(os.getenv("CELERY_INSPECT_TIMEOUT", "0.2"))
+# Broadcast inspection is opt-in; by default only the broker queue depth is reported
+INSPECT_WORKERS = os.getenv("METRICS_INSPECT_WORKERS", "false").lower() in ("1", "true", "yes")
+_job_cache: Dict[str, Any] = {"ts": 0.0, "val": None}
+_job_cache_lock = threading.Lock()
+
+
+def _inspect(method: str) -> Dict[str, Any]:
+    # One Inspect per call; the three broadcasts run on separate threads
+    return getattr(celery_app.control.inspect(timeout=INSPECT_TIMEOUT), method)() or {}
+
+
+def _queue_depth() -> int:
+    # Redis transport keeps pending messages in a list named after the queue (broker and cache share Redis)
+    return get_redis_client().llen(celery_app.conf.task_default_queue)
 
 
 def get_job_metrics() -> Dict[str, Any]:
-    try:
-        inspect = celery_app.control.inspect()
-        active_tasks = inspect.active() or {}
-        scheduled_tasks = inspect.scheduled() or {}
-        reserved_tasks = inspect.reserved() or {}
+    with _job_cache_lock:
+        if _job_cache["val"] is not None and time.monotonic() - _job_cache["ts"] < JOB_METRICS_TTL:
+            return _job_cache["val"]
         
-        task_counts = {
-            "active": sum(len(tasks) for tasks in active_tasks.values()),
-            "scheduled": sum(len(tasks) for tasks in scheduled_tasks.values()),
-            "reserved": sum(len(tasks) for tasks in reserved_tasks.values()),
-        }
+        # Failures are cached too, so an unreachable broker is not retried on every poll
+        job_info = _fetch_job_metrics()
+        _job_cache["ts"] = time.monotonic()
+        _job_cache["val"] = job_info
+        return job_info
+
+
+def _fetch_job_metrics() -> Dict[str, Any]:
+    try:
+        task_counts = {"queued": _queue_depth()}
+        job_info = {"task_counts": task_counts}
         
-        job_info = {
-            "task_counts": task_counts,
-            "workers_connected": len(active_tasks),
-        }
+        if INSPECT_WORKERS:
+            # Overlap the broadcast round trips instead of waiting for each in turn
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                active_tasks, scheduled_tasks, reserved_tasks = executor.map(
+                    _inspect, ["active", "scheduled", "reserved"]
+                )
+            
+            task_counts["active"] = sum(len(tasks) for tasks in active_tasks.values())
+            task_counts["scheduled"] = sum(len(tasks) for tasks in scheduled_tasks.values())
+            task_counts["reserved"] = sum(len(tasks) for tasks in reserved_tasks.values())
+            job_info["workers_connected"] = len(active_tasks)
         
         return job_info
     except Exception as e:
         return {
             "error": str(e),
-            "task_counts": {"active": 0, "scheduled": 0, "reserved": 0},
-            "workers_connected": 0,
+            "task_counts": {"queued": 0},
         }
 
 
@@ -79,16 +111,17 @@ def get_metrics():
     total_requests = get_total_request_count()
     job_metrics = get_job_metrics()
     
-    return MetricsResponse(
-        requests={
+    # Plain dict straight to orjson; MetricsResponse only documents the shape
+    return ORJSONResponse({
+        "requests": {
             "total": total_requests,
             "by_endpoint": request_counts,
         },
-        latency={
+        "latency": {
             "overall": overall_latency,
             "by_endpoint": endpoint_latencies,
         },
-        cache=cache_stats,
-        jobs=job_metrics,
-    )
+        "cache": cache_stats,
+        "jobs": job_metrics,
+    })
 
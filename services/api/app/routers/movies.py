@@ -1,10 +1,14 @@
-import math
+import base64
+import binascii
 from fastapi import APIRouter, Depends, Query, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from ..deps import get_db
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Optional, Tuple
+from ..cache import cached, cached_json
+from ..deps import get_async_db
 from ..models import Movie
-from ..schemas import MovieOut, MovieDetailOut, TrendingMovieOut, MessageResponse, GenreOut
+from ..responses import ORJSONResponse
+from ..schemas import MovieOut, MovieDetailOut, TrendingMovieOut, MessageResponse
 
 router = APIRouter(prefix="/movies", tags=["movies"])
 
@@ -12,60 +16,102 @@ router = APIRouter(prefix="/movies", tags=["movies"])
 def ping():
     return {"ok": True}
 
+def encode_cursor(popularity: Optional[float], movie_id: int) -> str:
+    """Encode a (popularity, id) keyset position; NULL popularity is left empty"""
+    pop = "" if popularity is None else repr(float(popularity))
+    return base64.urlsafe_b64encode(f"{pop}:{movie_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[float], int]:
+    try:
+        pop, _, movie_id = base64.urlsafe_b64decode(cursor.encode()).decode().partition(":")
+        return (float(pop) if pop else None), int(movie_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+LIST_COLUMNS = (
+    Movie.id,
+    Movie.title,
+    Movie.release_date,
+    Movie.overview,
+    Movie.popularity,
+    Movie.rating.label("vote_average"),
+    Movie.vote_count,
+    Movie.is_trending,
+    Movie.is_underrated,
+)
+
+
+@cached(ttl=300, key_prefix="movies:list")
+async def _list_movies_page(limit: int, offset: int, cursor: Optional[str], db: AsyncSession) -> Dict[str, Any]:
+    # Rows come back in ix_movies_pop_id order: popularity DESC NULLS LAST, id DESC
+    order = (Movie.popularity.desc().nullslast(), Movie.id.desc())
+    if cursor is None:
+        rows = (await db.execute(
+            select(*LIST_COLUMNS).order_by(*order).offset(offset).limit(limit)
+        )).mappings().all()
+    else:
+        last_pop, last_id = decode_cursor(cursor)
+        rows = []
+        if last_pop is not None:
+            rows = (await db.execute(
+                select(*LIST_COLUMNS)
+                .where(tuple_(Movie.popularity, Movie.id) < tuple_(last_pop, last_id))
+                .order_by(*order)
+                .limit(limit)
+            )).mappings().all()
+        # Row comparison never matches NULL popularity; page into the NULL tail separately
+        if len(rows) < limit:
+            null_tail = select(*LIST_COLUMNS).where(Movie.popularity.is_(None))
+            if last_pop is None:
+                null_tail = null_tail.where(Movie.id < last_id)
+            rows = list(rows) + list((await db.execute(
+                null_tail.order_by(Movie.id.desc()).limit(limit - len(rows))
+            )).mappings().all())
+
+    items = [dict(r) for r in rows]
+    next_cursor = None
+    if len(items) == limit:
+        next_cursor = encode_cursor(items[-1]["popularity"], items[-1]["id"])
+    return {"items": items, "next_cursor": next_cursor}
+
+
+# Hot read paths return ORJSONResponse directly: rows already have the response
+# shape, so FastAPI skips re-validating them. response_model only documents it.
 @router.get("", response_model=List[MovieOut])
-def list_movies(
+async def list_movies(
     limit: int = Query(20, ge=1, le=100),
-    offset: int = Query(0, ge=0),
-    db: Session = Depends(get_db),
+    offset: int = Query(0, ge=0, description="Ignored when cursor is given"),
+    cursor: Optional[str] = Query(None, description="Keyset cursor from the X-Next-Cursor header"),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    movies = (
-        db.query(Movie)
-        .order_by(Movie.popularity.desc())
-        .offset(offset)
-        .limit(limit)
-        .all()
-    )
-    return [
-        MovieOut(
-            id=m.id,
-            title=m.title,
-            release_date=m.release_date,
-            overview=m.overview,
-            popularity=m.popularity,
-            vote_average=m.rating,
-            vote_count=m.vote_count,
-            is_trending=m.is_trending,
-            is_underrated=m.is_underrated,
-        )
-        for m in movies
-    ]
+    page = await _list_movies_page(limit=limit, offset=offset, cursor=cursor, db=db)
+    response = ORJSONResponse(page["items"])
+    if page["next_cursor"]:
+        response.headers["X-Next-Cursor"] = page["next_cursor"]
+    return response
 
 @router.get("/trending", response_model=List[TrendingMovieOut])
-def trending(limit: int = Query(20, ge=1, le=100), db: Session = Depends(get_db)):
-    movies = db.query(Movie).all()
-    
-    def score(m):
-        pop = m.popularity or 0.0
-        vc = m.vote_count or 0
-        return pop * math.log(vc + 1)
-    
-    ranked = sorted(movies, key=score, reverse=True)[:limit]
-    
-    return [
-        TrendingMovieOut(
-            id=m.id,
-            title=m.title,
-            popularity=m.popularity,
-            vote_average=m.rating,
-            vote_count=m.vote_count,
-            trending_score=score(m),
+@cached_json(ttl=300, key_prefix="movies:trending")
+async def trending(limit: int = Query(20, ge=1, le=100), db: AsyncSession = Depends(get_async_db)):
+    rows = (await db.execute(
+        select(
+            Movie.id,
+            Movie.title,
+            Movie.popularity,
+            Movie.rating.label("vote_average"),
+            Movie.vote_count,
+            Movie.trending_score,
         )
-        for m in ranked
-    ]
+        .order_by(Movie.trending_score.desc().nullslast())
+        .limit(limit)
+    )).mappings().all()
+    return [dict(r) for r in rows]
 
 @router.get("/{movie_id}", response_model=MovieDetailOut)
-def get_movie(movie_id: int, db: Session = Depends(get_db)):
-    movie = db.get(Movie, movie_id)
+async def get_movie(movie_id: int, db: AsyncSession = Depends(get_async_db)):
+    movie = await db.get(Movie, movie_id)
     if not movie:
         raise HTTPException(status_code=404, detail="Movie not found")
     
@@ -75,28 +121,27 @@ def get_movie(movie_id: int, db: Session = Depends(get_db)):
         # genres is stored as JSON array: [{"id": 28, "name": "Action"}, ...]
         if isinstance(movie.genres, list):
             genres = [
-                GenreOut(id=g.get("id"), name=g.get("name"))
+                {"id": g.get("id"), "name": g.get("name")}
                 for g in movie.genres
                 if g.get("id") and g.get("name")
             ]
     
-    return MovieDetailOut(
-        id=movie.id,
-        title=movie.title,
-        release_date=movie.release_date,
-        overview=movie.overview,
-        popularity=movie.popularity,
-        vote_average=movie.rating,
-        vote_count=movie.vote_count,
-        genres=genres,
-        poster_path=movie.poster_path,
-        backdrop_path=movie.backdrop_path,
-        runtime=movie.runtime,
-        budget=movie.budget,
-        revenue=movie.revenue,
-        tagline=movie.tagline,
-        status=movie.status,
-        is_trending=movie.is_trending,
-        is_underrated=movie.is_underrated,
-    )
-
+    return ORJSONResponse({
+        "id": movie.id,
+        "title": movie.title,
+        "release_date": movie.release_date,
+        "overview": movie.overview,
+        "popularity": movie.popularity,
+        "vote_average": movie.rating,
+        "vote_count": movie.vote_count,
+        "genres": genres,
+        "poster_path": movie.poster_path,
+        "backdrop_path": movie.backdrop_path,
+        "runtime": movie.runtime,
+        "budget": movie.budget,
+        "revenue": movie.revenue,
+        "tagline": movie.tagline,
+        "status": movie.status,
+        "is_trending": movie.is_trending,
+        "is_underrated": movie.is_underrated,
+    })
@@ -2,19 +2,49 @@ import os
 from typing import List, Optional
 from fastapi import APIRouter, Query, HTTPException
 from meilisearch import Client
-from meilisearch.errors import MeilisearchError
+from meilisearch.errors import MeilisearchApiError, MeilisearchCommunicationError
+from meilisearch.index import Index
 from pydantic import BaseModel
 from dotenv import load_dotenv
+from ..cache import cached_json
 
 load_dotenv()
 
 router = APIRouter(prefix="/search", tags=["search"])
 
 
+MEILI_URL = os.getenv("MEILI_URL", "http://localhost:7700")
+MEILI_MASTER_KEY = os.getenv("MEILI_MASTER_KEY", "dev_master_key")
+
+_meili_client: Optional[Client] = None
+
+
 def get_meilisearch_client() -> Client:
-    meili_url = os.getenv("MEILI_URL", "http://localhost:7700")
-    meili_key = os.getenv("MEILI_MASTER_KEY", "dev_master_key")
-    return Client(meili_url, meili_key)
+    """Process-wide Meilisearch client, shared by search and the health probe"""
+    global _meili_client
+    if _meili_client is None:
+        _meili_client = Client(MEILI_URL, MEILI_MASTER_KEY)
+    return _meili_client
+
+
+_movies_index: Optional[Index] = None
+
+
+def get_movies_index() -> Index:
+    """Local handle to the movies index; unlike get_index() it costs no HTTP round trip"""
+    global _movies_index
+    if _movies_index is None:
+        _movies_index = get_meilisearch_client().index("movies")
+    return _movies_index
+
+
+# Index maxTotalHits (set by the search worker); Meilisearch returns nothing past it
+SEARCH_MAX_TOTAL_HITS = 1000
+
+# Only the fields SearchResult exposes; keeps Meilisearch payloads (and decoding) small
+SEARCH_ATTRIBUTES = ["id", "title", "overview", "release_year", "genres", "vote_average", "vote_count", "popularity"]
+
+INDEX_UNAVAILABLE = "Search index not available. Please build the index first using /admin/search/build-index"
 
 
 class SearchResult(BaseModel):
@@ -36,74 +66,72 @@ class SearchResponse(BaseModel):
     offset: int
 
 
+def quote_filter_value(value: str) -> str:
+    """Double-quoted Meilisearch filter literal; user input cannot close the quotes"""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+# Results only change when the index is rebuilt; a short TTL bounds staleness after a build
 @router.get("", response_model=SearchResponse)
+@cached_json(ttl=60, key_prefix="search")
 def search_movies(
     q: str = Query(..., description="Search query string"),
     min_rating: Optional[float] = Query(None, ge=0, le=10, description="Minimum rating filter"),
     year: Optional[int] = Query(None, description="Filter by release year"),
     genre: Optional[str] = Query(None, description="Filter by genre name"),
     limit: int = Query(20, ge=1, le=100, description="Number of results to return"),
-    offset: int = Query(0, ge=0, description="Offset for pagination"),
+    offset: int = Query(0, ge=0, lt=SEARCH_MAX_TOTAL_HITS, description="Offset for pagination"),
 ):
-    client = get_meilisearch_client()
-    index_name = "movies"
+    index = get_movies_index()
     
-    try:
-        index = client.get_index(index_name)
-    except MeilisearchError:
-        raise HTTPException(
-            status_code=503,
-            detail="Search index not available. Please build the index first using /admin/search/build-index"
-        )
+    # Plain limit/offset pagination (no page/hitsPerPage exhaustive count), kept inside maxTotalHits
+    limit = min(limit, SEARCH_MAX_TOTAL_HITS - offset)
+    search_params = {"limit": limit, "offset": offset, "attributesToRetrieve": SEARCH_ATTRIBUTES}
     
-    # Build filter string
+    # Meilisearch ANDs the entries of a filter array; no filter key at all when unfiltered
     filters = []
-    
     if min_rating is not None:
         filters.append(f"vote_average >= {min_rating}")
-    
     if year is not None:
         filters.append(f"release_year = {year}")
-    
     if genre is not None:
-        # Genre filter - Meilisearch array filter syntax
-        filters.append(f'genres = "{genre}"')
-    
-    filter_string = " AND ".join(filters) if filters else None
+        filters.append(f"genres = {quote_filter_value(genre)}")
+    if filters:
+        search_params["filter"] = filters
     
-    # Perform search
+    # Perform search; a missing index or unreachable Meilisearch surfaces here
     try:
-        search_results = index.search(
-            q,
-            {
-                "limit": limit,
-                "offset": offset,
-                "filter": filter_string,
-            }
-        )
+        search_results = index.search(q, search_params)
         
-        # Convert hits to SearchResult models
+        # Meilisearch hits are trusted JSON: shape them as SearchResult dicts and skip
+        # model validation (cached_json serializes them); response_model only documents the shape
         hits = [
-            SearchResult(
-                id=hit["id"],
-                title=hit.get("title", ""),
-                overview=hit.get("overview"),
-                release_year=hit.get("release_year"),
-                genres=hit.get("genres", []),
-                vote_average=hit.get("vote_average"),
-                vote_count=hit.get("vote_count", 0),
-                popularity=hit.get("popularity"),
-            )
+            {
+                "id": hit["id"],
+                "title": hit.get("title", ""),
+                "overview": hit.get("overview"),
+                "release_year": hit.get("release_year"),
+                "genres": hit.get("genres", []),
+                "vote_average": hit.get("vote_average"),
+                "vote_count": hit.get("vote_count", 0),
+                "popularity": hit.get("popularity"),
+            }
             for hit in search_results["hits"]
         ]
         
-        return SearchResponse(
-            query=q,
-            hits=hits,
-            total=search_results["estimatedTotalHits"],
-            limit=limit,
-            offset=offset,
-        )
+        return {
+            "query": q,
+            "hits": hits,
+            "total": search_results["estimatedTotalHits"],
+            "limit": limit,
+            "offset": offset,
+        }
+    except MeilisearchCommunicationError:
+        raise HTTPException(status_code=503, detail=INDEX_UNAVAILABLE)
+    except MeilisearchApiError as e:
+        if e.code == "index_not_found":
+            raise HTTPException(status_code=503, detail=INDEX_UNAVAILABLE)
+        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -1,6 +1,9 @@
 from datetime import date
 from typing import Optional, List
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
+
+# Output schemas are read-only views of ORM rows / query results
+OUT_CONFIG = ConfigDict(from_attributes=True, frozen=True)
 
 
 # Genre Schema
@@ -9,8 +12,7 @@ class GenreOut(BaseModel):
     id: int
     name: str
 
-    class Config:
-        from_attributes = True
+    model_config = OUT_CONFIG
 
 
 # Movie Schemas
@@ -26,8 +28,7 @@ class MovieOut(BaseModel):
     is_trending: bool = False
     is_underrated: bool = False
 
-    class Config:
-        from_attributes = True
+    model_config = OUT_CONFIG
 
 
 class MovieDetailOut(BaseModel):
@@ -50,8 +51,7 @@ class MovieDetailOut(BaseModel):
     is_trending: bool = False
     is_underrated: bool = False
 
-    class Config:
-        from_attributes = True
+    model_config = OUT_CONFIG
 
 
 class TrendingMovieOut(BaseModel):
@@ -63,8 +63,7 @@ class TrendingMovieOut(BaseModel):
     vote_count: int = 0
     trending_score: float = Field(..., description="Calculated trending score")
 
-    class Config:
-        from_attributes = True
+    model_config = OUT_CONFIG
 
 
 # Analytics Schemas
@@ -74,8 +73,7 @@ class TopGenreOut(BaseModel):
     name: str
     movie_count: int = Field(..., description="Number of movies in this genre")
 
-    class Config:
-        from_attributes = True
+    model_config = OUT_CONFIG
 
 
 class RatingsByDecadeOut(BaseModel):
@@ -84,8 +82,7 @@ class RatingsByDecadeOut(BaseModel):
     avg_rating: float = Field(..., description="Average rating for movies in this decade")
     movie_count: int = Field(..., description="Number of movies released in this decade")
 
-    class Config:
-        from_attributes = True
+    model_config = OUT_CONFIG
 
 
 # Response wrapper schemas
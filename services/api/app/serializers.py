@@ -0,0 +1,17 @@
+"""
+Celery/kombu serializer backed by orjson
+"""
+import orjson
+from kombu.serialization import register
+
+ORJSON_CONTENT_TYPE = "application/x-orjson"
+
+
+def _dumps(obj) -> bytes:
+    # stdlib json stringifies int keys (e.g. {movie_id: ...} results); do the same
+    return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+
+def register_orjson_serializer():
+    """Make "orjson" available as a task/result serializer; safe to call repeatedly"""
+    register("orjson", _dumps, orjson.loads, content_type=ORJSON_CONTENT_TYPE, content_encoding="utf-8")
@@ -5,9 +5,11 @@ import os
 from celery.schedules import crontab
 from celery import Celery
 from dotenv import load_dotenv
+from services.api.app.serializers import register_orjson_serializer
 
 # Load environment variables
 load_dotenv()
+register_orjson_serializer()
 
 # Create Celery app
 celery_app = Celery(
@@ -23,9 +25,10 @@ celery_app = Celery(
 
 # Celery configuration
 celery_app.conf.update(
-    task_serializer="json",
-    accept_content=["json"],
-    result_serializer="json",
+    # orjson is faster and smaller than stdlib json; json stays accepted for messages already queued
+    task_serializer="orjson",
+    accept_content=["orjson", "json"],
+    result_serializer="orjson",
     timezone="UTC",
     enable_utc=True,
     task_track_started=True,
@@ -61,7 +64,7 @@ celery_app.conf.update(
         },
         # Weekly recommendations recompute - runs every Monday at 5 AM UTC
         "weekly-recommendations-recompute": {
-            "task": "compute.recommendations",
+            "task": "compute.recommendations_dispatch",
             "schedule": crontab(hour=5, minute=0, day_of_week=1),  # Monday = 1
             "options": {"expires": 10800},  # Expire after 3 hours (recommendations can take time)
         },
@@ -1,13 +1,15 @@
-import math
 from datetime import date, datetime, timedelta
 from collections import Counter
-from typing import List, Dict
-from celery import Task
-from sqlalchemy import func, extract
+from typing import List, Dict, NamedTuple
+import numpy as np
+from celery import Task, group
+from sqlalchemy import Date, Integer, cast, func, extract, insert, literal, select, update, text
 from sqlalchemy.orm import Session
 from .celery_app import celery_app
+from services.api.app.cache import delete_pattern_from_cache
 from services.api.app.db import SessionLocal
 from services.api.app.models import (
+    ANALYTICS_VIEWS,
     Movie,
     MovieTrendingDaily,
     GenreStatsDaily,
@@ -16,6 +18,19 @@ from services.api.app.models import (
 )
 
 
+# Rows per bulk INSERT; keeps statement size and memory bounded on large tables
+BULK_INSERT_BATCH = 5000
+# Rows fetched per round trip when streaming large reads
+STREAM_BATCH = 1000
+
+
+def _bulk_insert(db: Session, model, rows: List[Dict]):
+    """Multi-row INSERTs without building ORM objects; commits are left to the caller"""
+    # Core executemany: psycopg2 sends each batch as multi-VALUES statements (insertmanyvalues)
+    for start in range(0, len(rows), BULK_INSERT_BATCH):
+        db.execute(insert(model.__table__), rows[start:start + BULK_INSERT_BATCH])
+
+
 @celery_app.task(name="compute.trending", bind=True)
 def compute_trending(self: Task, target_date: str = None):
     db = SessionLocal()
@@ -25,45 +40,31 @@ def compute_trending(self: Task, target_date: str = None):
         else:
             compute_date = date.today()
         
-        movies = db.query(Movie).filter(
+        # Normalized score calculation
+        score = (
+            (Movie.popularity * 0.4) +
+            (Movie.rating * 20 * 0.3) +
+            (func.ln(func.coalesce(Movie.vote_count, 0) + 1) * 10 * 0.3)
+        )
+        ranked = select(
+            Movie.id,
+            literal(compute_date, Date),
+            score,
+            func.row_number().over(order_by=(score.desc(), Movie.id)),
+        ).where(
             Movie.popularity.isnot(None),
             Movie.rating.isnot(None),
-        ).all()
-        
-        trending_scores = []
-        for movie in movies:
-            popularity = movie.popularity or 0
-            rating = movie.rating or 0
-            vote_count = movie.vote_count or 0
-            
-            # Normalized score calculation
-            score = (
-                (popularity * 0.4) +
-                (rating * 20 * 0.3) +
-                (math.log(vote_count + 1) * 10 * 0.3)
-            )
-            
-            trending_scores.append({
-                "movie_id": movie.id,
-                "score": score,
-            })
-        
-        trending_scores.sort(key=lambda x: x["score"], reverse=True)
+        )
         
         db.query(MovieTrendingDaily).filter(
             MovieTrendingDaily.date == compute_date
         ).delete()
         
-        count = 0
-        for rank, item in enumerate(trending_scores, start=1):
-            trending_record = MovieTrendingDaily(
-                movie_id=item["movie_id"],
-                date=compute_date,
-                score=item["score"],
-                rank=rank,
-            )
-            db.add(trending_record)
-            count += 1
+        # Scored, ranked and written in one statement; no rows come back to Python
+        result = db.execute(
+            insert(MovieTrendingDaily).from_select(["movie_id", "date", "score", "rank"], ranked)
+        )
+        count = result.rowcount
         
         db.commit()
         
@@ -79,6 +80,20 @@ def compute_trending(self: Task, target_date: str = None):
         db.close()
 
 
+# avg() skips NULL ratings while volume counts every movie tagged with the genre
+GENRE_STATS_SQL = text("""
+    INSERT INTO genre_stats_daily (genre_id, genre_name, date, avg_rating, volume)
+    SELECT (g->>'id')::int, max(g->>'name'), :compute_date, avg(movies.rating), count(*)
+    FROM movies
+    CROSS JOIN LATERAL jsonb_array_elements(movies.genres) AS g
+    WHERE jsonb_typeof(movies.genres) = 'array'
+      AND jsonb_typeof(g) = 'object'
+      AND coalesce(g->>'id', '0') <> '0'
+      AND coalesce(g->>'name', '') <> ''
+    GROUP BY 1
+""")
+
+
 @celery_app.task(name="compute.genre_stats", bind=True)
 def compute_genre_stats(self: Task, target_date: str = None):
     db = SessionLocal()
@@ -88,50 +103,16 @@ def compute_genre_stats(self: Task, target_date: str = None):
         else:
             compute_date = date.today()
         
-        movies = db.query(Movie).all()
-        genre_data = {}
-        
-        for movie in movies:
-            if movie.genres and isinstance(movie.genres, list):
-                for genre in movie.genres:
-                    if isinstance(genre, dict):
-                        genre_id = genre.get("id")
-                        genre_name = genre.get("name")
-                        
-                        if genre_id and genre_name:
-                            if genre_id not in genre_data:
-                                genre_data[genre_id] = {
-                                    "name": genre_name,
-                                    "ratings": [],
-                                    "count": 0,
-                                }
-                            
-                            if movie.rating is not None:
-                                genre_data[genre_id]["ratings"].append(movie.rating)
-                            genre_data[genre_id]["count"] += 1
-        
         db.query(GenreStatsDaily).filter(
             GenreStatsDaily.date == compute_date
         ).delete()
         
-        count = 0
-        for genre_id, data in genre_data.items():
-            avg_rating = (
-                sum(data["ratings"]) / len(data["ratings"])
-                if data["ratings"] else None
-            )
-            
-            genre_stat = GenreStatsDaily(
-                genre_id=genre_id,
-                genre_name=data["name"],
-                date=compute_date,
-                avg_rating=avg_rating,
-                volume=data["count"],
-            )
-            db.add(genre_stat)
-            count += 1
+        # Aggregated in one pass over the genres arrays; no movies are loaded into Python
+        result = db.execute(GENRE_STATS_SQL, {"compute_date": compute_date})
+        count = result.rowcount
         
         db.commit()
+        delete_pattern_from_cache("analytics:top_genres*")
         
         return {
             "status": "success",
@@ -149,30 +130,22 @@ def compute_genre_stats(self: Task, target_date: str = None):
 def compute_ratings_by_decade(self: Task):
     db = SessionLocal()
     try:
-        rows = (
-            db.query(
-                (func.floor(extract("year", Movie.release_date) / 10) * 10).label("decade"),
-                func.avg(Movie.rating).label("avg_rating"),
-                func.count(Movie.id).label("movie_count"),
-            )
-            .filter(Movie.release_date.isnot(None))
-            .filter(Movie.rating.isnot(None))
-            .group_by("decade")
-            .all()
+        decade = cast(func.floor(extract("year", Movie.release_date) / 10) * 10, Integer)
+        by_decade = (
+            select(decade, func.avg(Movie.rating), func.count(Movie.id))
+            .where(Movie.release_date.isnot(None), Movie.rating.isnot(None))
+            .group_by(decade)
         )
         
         db.query(RatingsByDecade).delete()
-        count = 0
-        for row in rows:
-            decade_record = RatingsByDecade(
-                decade=int(row.decade),
-                avg_rating=float(row.avg_rating) if row.avg_rating else None,
-                movie_count=row.movie_count,
-            )
-            db.add(decade_record)
-            count += 1
+        # Aggregated and written in one statement, like compute_trending
+        result = db.execute(
+            insert(RatingsByDecade).from_select(["decade", "avg_rating", "movie_count"], by_decade)
+        )
+        count = result.rowcount
         
         db.commit()
+        delete_pattern_from_cache("analytics:ratings_by_decade*")
         
         return {
             "status": "success",
@@ -185,87 +158,145 @@ def compute_ratings_by_decade(self: Task):
         db.close()
 
 
+class MovieRef(NamedTuple):
+    id: int
+    title: str
+    rating: float
+
+
+RECOMMENDATIONS_PER_MOVIE = 10
+RECOMMENDATION_MIN_SCORE = 0.3
+# Upper bound on pairwise scores held at once (targets per block x candidates)
+RECOMMENDATION_BLOCK_PAIRS = 2_000_000
+
+
+def _genre_ids(genres) -> set:
+    if not genres or not isinstance(genres, list):
+        return set()
+    return {g.get("id") for g in genres if isinstance(g, dict) and g.get("id")}
+
+
+def _genre_matrix(genre_sets: List[set], columns: Dict[int, int]) -> np.ndarray:
+    """One-hot movies x genres membership matrix"""
+    matrix = np.zeros((len(genre_sets), len(columns)), dtype=np.float64)
+    for row, genre_ids in enumerate(genre_sets):
+        matrix[row, [columns[g] for g in genre_ids]] = 1.0
+    return matrix
+
+
+def top_recommendations(
+    target_ids: np.ndarray,
+    target_genres: np.ndarray,
+    target_ratings: np.ndarray,
+    candidate_ids: np.ndarray,
+    candidate_genres: np.ndarray,
+    candidate_ratings: np.ndarray,
+):
+    """Yield (target_row, candidate_rows, scores) with the best candidates per target,
+    scored as 0.5 * genre Jaccard + 0.5 * rating closeness, highest first."""
+    candidate_sizes = candidate_genres.sum(axis=1)
+    target_sizes = target_genres.sum(axis=1)
+    block = max(1, RECOMMENDATION_BLOCK_PAIRS // max(1, len(candidate_ids)))
+    
+    for start in range(0, len(target_ids), block):
+        stop = start + block
+        overlap = target_genres[start:stop] @ candidate_genres.T
+        union = target_sizes[start:stop, None] + candidate_sizes[None, :] - overlap
+        genre_score = overlap / union
+        rating_diff = np.abs(target_ratings[start:stop, None] - candidate_ratings[None, :])
+        rating_score = np.maximum(0.0, 1.0 - rating_diff / 10)
+        raw_scores = genre_score * 0.5 + rating_score * 0.5
+        raw_scores[target_ids[start:stop, None] == candidate_ids[None, :]] = -1.0
+        # The threshold applies to the exact score; ranking and storage use the rounded one
+        scores = np.round(raw_scores, 4)
+        
+        for offset, row in enumerate(scores):
+            picked = np.flatnonzero(raw_scores[offset] > RECOMMENDATION_MIN_SCORE)
+            if not len(picked):
+                continue
+            if len(picked) > RECOMMENDATIONS_PER_MOVIE:
+                picked = picked[np.argpartition(-row[picked], RECOMMENDATIONS_PER_MOVIE - 1)[:RECOMMENDATIONS_PER_MOVIE]]
+            # Stable sort keeps candidate order among equal scores
+            picked = picked[np.argsort(-row[picked], kind="stable")]
+            yield start + offset, picked, row[picked]
+
+
+def _replace_recommendations(db: Session, records: List[Dict]) -> int:
+    if records:
+        db.query(MovieRecommendations).filter(
+            MovieRecommendations.movie_id.in_([record["movie_id"] for record in records])
+        ).delete(synchronize_session=False)
+        _bulk_insert(db, MovieRecommendations, records)
+    return len(records)
+
+
 @celery_app.task(name="compute.recommendations", bind=True)
-def compute_recommendations(self: Task, movie_id: int = None):
+def compute_recommendations(self: Task, movie_id: int = None, movie_ids: List[int] = None):
+    """Recommendations for one movie, a shard of movie_ids, or (with neither) every movie"""
     db = SessionLocal()
     try:
-        if movie_id:
-            movies_to_process = db.query(Movie).filter(Movie.id == movie_id).all()
+        # Streamed through a server-side cursor; only (id, title, rating) and the genre id set are kept
+        candidate_rows = db.execute(
+            select(Movie.id, Movie.title, Movie.rating, Movie.genres)
+            .where(Movie.genres.isnot(None), Movie.rating.isnot(None))
+            .order_by(Movie.id)
+            .execution_options(yield_per=STREAM_BATCH)
+        )
+        candidates = []
+        for movie in candidate_rows:
+            genre_ids = _genre_ids(movie.genres)
+            if genre_ids:
+                candidates.append((MovieRef(movie.id, movie.title, movie.rating), genre_ids))
+        
+        target_ids = [movie_id] if movie_id else movie_ids
+        if target_ids:
+            targets = [
+                (MovieRef(movie.id, movie.title, movie.rating), _genre_ids(movie.genres))
+                for movie in db.query(Movie.id, Movie.title, Movie.rating, Movie.genres)
+                .filter(Movie.id.in_(target_ids))
+                .order_by(Movie.id)
+            ]
+            targets = [(movie, genre_ids) for movie, genre_ids in targets if genre_ids]
         else:
-            movies_to_process = db.query(Movie).filter(
-                Movie.genres.isnot(None),
-                Movie.rating.isnot(None),
-            ).all()
+            targets = candidates
         
-        count = 0
         generated_at = datetime.now()
+        records = []
+        count = 0
         
-        for movie in movies_to_process:
-            if not movie.genres or not isinstance(movie.genres, list):
-                continue
-            
-            movie_genre_ids = {
-                g.get("id") for g in movie.genres
-                if isinstance(g, dict) and g.get("id")
-            }
-            
-            if not movie_genre_ids:
-                continue
+        if targets and candidates:
+            columns: Dict[int, int] = {}
+            for _, genre_ids in targets + candidates:
+                for genre_id in genre_ids:
+                    columns.setdefault(genre_id, len(columns))
             
-            recommendations = []
-            
-            all_movies = db.query(Movie).filter(
-                Movie.id != movie.id,
-                Movie.genres.isnot(None),
-                Movie.rating.isnot(None),
-            ).all()
-            
-            for other_movie in all_movies:
-                if not other_movie.genres or not isinstance(other_movie.genres, list):
-                    continue
-                
-                other_genre_ids = {
-                    g.get("id") for g in other_movie.genres
-                    if isinstance(g, dict) and g.get("id")
-                }
-                
-                if not other_genre_ids:
-                    continue
-                
-                overlap = len(movie_genre_ids & other_genre_ids)
-                total_genres = len(movie_genre_ids | other_genre_ids)
-                genre_score = overlap / total_genres if total_genres > 0 else 0
-                
-                rating_diff = abs((movie.rating or 0) - (other_movie.rating or 0))
-                rating_score = max(0, 1 - (rating_diff / 10))
-                
-                combined_score = (genre_score * 0.5) + (rating_score * 0.5)
-                
-                if combined_score > 0.3:
-                    recommendations.append({
-                        "movie_id": other_movie.id,
-                        "title": other_movie.title,
-                        "score": round(combined_score, 4),
-                        "rating": other_movie.rating,
-                    })
-            
-            recommendations.sort(key=lambda x: x["score"], reverse=True)
-            recommendations = recommendations[:10]
-            
-            if recommendations:
-                db.query(MovieRecommendations).filter(
-                    MovieRecommendations.movie_id == movie.id
-                ).delete()
-                
-                # Insert new recommendations
-                rec_record = MovieRecommendations(
-                    movie_id=movie.id,
-                    recommendations_json=recommendations,
-                    generated_at=generated_at,
-                )
-                db.add(rec_record)
-                count += 1
+            candidate_ids = np.array([movie.id for movie, _ in candidates])
+            for row, picked, scores in top_recommendations(
+                np.array([movie.id for movie, _ in targets]),
+                _genre_matrix([genre_ids for _, genre_ids in targets], columns),
+                np.array([movie.rating or 0 for movie, _ in targets], dtype=np.float64),
+                candidate_ids,
+                _genre_matrix([genre_ids for _, genre_ids in candidates], columns),
+                np.array([movie.rating for movie, _ in candidates], dtype=np.float64),
+            ):
+                records.append({
+                    "movie_id": targets[row][0].id,
+                    "recommendations_json": [
+                        {
+                            "movie_id": candidates[j][0].id,
+                            "title": candidates[j][0].title,
+                            "score": float(score),
+                            "rating": candidates[j][0].rating,
+                        }
+                        for j, score in zip(picked.tolist(), scores.tolist())
+                    ],
+                    "generated_at": generated_at,
+                })
+                if len(records) >= BULK_INSERT_BATCH:
+                    count += _replace_recommendations(db, records)
+                    records = []
         
+        count += _replace_recommendations(db, records)
         db.commit()
         
         return {
@@ -280,6 +311,37 @@ def compute_recommendations(self: Task, movie_id: int = None):
         db.close()
 
 
+# Movies per compute.recommendations shard; each shard re-reads the candidate set once
+RECOMMENDATION_SHARD_SIZE = 2000
+
+
+@celery_app.task(name="compute.recommendations_dispatch")
+def dispatch_recommendations():
+    """Fan compute.recommendations out over workers in shards of movie ids"""
+    db = SessionLocal()
+    try:
+        ids = db.execute(
+            select(Movie.id)
+            .where(Movie.genres.isnot(None), Movie.rating.isnot(None))
+            .order_by(Movie.id)
+        ).scalars().all()
+        shards = [ids[i:i + RECOMMENDATION_SHARD_SIZE] for i in range(0, len(ids), RECOMMENDATION_SHARD_SIZE)]
+        if not shards:
+            return {"status": "success", "group_id": None, "shards": 0}
+        
+        job = group([compute_recommendations.s(movie_ids=shard) for shard in shards]).apply_async()
+        
+        return {
+            "status": "success",
+            "group_id": job.id,
+            "shards": len(shards),
+        }
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+    finally:
+        db.close()
+
+
 @celery_app.task(name="compute.update_trending")
 def update_trending_movies():
     return compute_trending.delay()
@@ -289,17 +351,19 @@ def update_trending_movies():
 def update_underrated_movies():
     db = SessionLocal()
     try:
-        movies = db.query(Movie).filter(
-            Movie.rating >= 7.5,
-            Movie.popularity < 30.0,
-            Movie.vote_count >= 100,
-        ).all()
-        
-        count = 0
-        for movie in movies:
-            if not movie.is_underrated:
-                movie.is_underrated = True
-                count += 1
+        # Single set-based UPDATE; rows already flagged are left untouched
+        result = db.execute(
+            update(Movie)
+            .where(
+                Movie.rating >= 7.5,
+                Movie.popularity < 30.0,
+                Movie.vote_count >= 100,
+                Movie.is_underrated.isnot(True),
+            )
+            .values(is_underrated=True)
+            .execution_options(synchronize_session=False)
+        )
+        count = result.rowcount
         
         db.commit()
         
@@ -314,6 +378,27 @@ def update_underrated_movies():
         db.close()
 
 
+@celery_app.task(name="compute.refresh_analytics_views")
+def refresh_analytics_views():
+    db = SessionLocal()
+    try:
+        for name in ANALYTICS_VIEWS:
+            # CONCURRENTLY keeps the views readable while they rebuild
+            db.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {name}"))
+        db.commit()
+        delete_pattern_from_cache("analytics:*")
+        
+        return {
+            "status": "success",
+            "views_refreshed": list(ANALYTICS_VIEWS),
+        }
+    except Exception as e:
+        db.rollback()
+        return {"status": "error", "message": str(e)}
+    finally:
+        db.close()
+
+
 @celery_app.task(name="compute.calculate_analytics")
 def calculate_analytics():
     trending_result = compute_trending.delay()
@@ -1,33 +1,107 @@
+import csv
+import io
 import os
+import orjson
 import requests
+import threading
 import time
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
 from celery import Task
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from sqlalchemy import column, func, select, table, text
+from sqlalchemy.dialects.postgresql import insert
 from .celery_app import celery_app
+from .tasks_compute import refresh_analytics_views
+from services.api.app.cache import delete_pattern_from_cache, get_from_cache, set_in_cache
 from services.api.app.db import SessionLocal
 from services.api.app.models import Movie
 
 
 BASE = "https://api.themoviedb.org/3"
+# Read once at import (.env is loaded by celery_app); never changes while the worker runs
+TMDB_API_KEY = os.getenv("TMDB_API_KEY")
 
+# TMDB allows roughly 40 requests per 10 seconds
+TMDB_RATE_LIMIT = 40
+TMDB_RATE_PERIOD = 10.0
+TMDB_MAX_CONCURRENCY = 20
 
-def tmdb_get(path, params=None, retries=3):
-    api_key = os.getenv("TMDB_API_KEY")
+# Stored details younger than this are reused instead of re-fetched
+DETAILS_MAX_AGE = timedelta(days=7)
+
+# Column order of movie_data_to_row rows, as written to movies_staging
+STAGING_COLUMNS = [
+    "id", "title", "release_date", "overview", "popularity", "rating", "vote_count",
+    "poster_path", "backdrop_path", "genres", "genre", "runtime", "budget", "revenue",
+    "tagline", "status", "is_trending", "is_underrated", "details_fetched_at",
+]
+
+# Explicit NULL marker so empty strings survive the CSV round trip
+STAGING_NULL = r"\N"
+
+# Columns a batch may lack (no genre_ids or no details); never overwritten with NULL on upsert.
+# details_fetched_at is only stamped on rows carrying details, so list-only upserts keep the old time.
+DETAIL_COLUMNS = {"genres", "genre", "runtime", "budget", "revenue", "tagline", "status", "details_fetched_at"}
+
+
+class RateLimiter:
+    """Thread-safe token bucket shared by every TMDB request in the process"""
+    
+    def __init__(self, rate: int, period: float):
+        self.capacity = rate
+        self.fill_rate = rate / period
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.fill_rate
+            time.sleep(wait_time)
+
+
+_rate_limiter = RateLimiter(TMDB_RATE_LIMIT, TMDB_RATE_PERIOD)
+
+
+def _build_session():
+    """Keep-alive session; urllib3 retries 429/5xx with backoff and honours Retry-After"""
+    session = requests.Session()
+    retry = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET"],
+        respect_retry_after_header=True,
+    )
+    # One pooled connection per concurrent detail fetch
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=TMDB_MAX_CONCURRENCY, max_retries=retry)
+    session.mount("https://", adapter)
+    return session
+
+
+_session = _build_session()
+
+
+def tmdb_get(path, params=None):
     params = params or {}
-    params["api_key"] = api_key
+    params["api_key"] = TMDB_API_KEY
     
-    for attempt in range(retries):
-        try:
-            r = requests.get(f"{BASE}{path}", params=params, timeout=30)
-            r.raise_for_status()
-            return r.json()
-        except requests.exceptions.RequestException as e:
-            if attempt < retries - 1:
-                wait_time = (attempt + 1) * 2
-                time.sleep(wait_time)
-            else:
-                return None
-    return None
+    _rate_limiter.acquire()
+    try:
+        r = _session.get(f"{BASE}{path}", params=params, timeout=30)
+        r.raise_for_status()
+        return r.json()
+    except requests.exceptions.RequestException:
+        return None
 
 
 def parse_date(s):
@@ -53,84 +127,179 @@ def calculate_is_underrated(movie_data):
     return rating >= 7.5 and vote_count < 1000
 
 
-def process_movie(movie_data, db, fetch_details=True):
-    """Process and save a movie to the database"""
-    movie_id = movie_data.get("id")
-    if not movie_id:
-        return None
-    
-    # Check if movie exists
-    movie = db.query(Movie).filter(Movie.id == movie_id).first()
+_genre_map = {}
+
+
+def get_genre_map(refresh=False):
+    """TMDB genre id -> name lookup, fetched once per process from /genre/movie/list"""
+    global _genre_map
+    if refresh or not _genre_map:
+        gdata = tmdb_get("/genre/movie/list", {"language": "en-US"})
+        if gdata and "genres" in gdata:
+            _genre_map = {g["id"]: g["name"] for g in gdata["genres"]}
+    return _genre_map
+
+
+def movie_data_to_row(movie_data, details=None, genre_map=None):
+    """Build a movies row from TMDB list data and optional detail data"""
+    genre_ids = movie_data.get("genre_ids") or []
+    genre_map = genre_map or {}
+    genre_names = [genre_map[gid] for gid in genre_ids if gid in genre_map]
+    row = {
+        "id": movie_data["id"],
+        "title": movie_data.get("title") or movie_data.get("original_title") or "",
+        "release_date": parse_date(movie_data.get("release_date")),
+        "overview": movie_data.get("overview"),
+        "popularity": movie_data.get("popularity"),
+        "rating": movie_data.get("vote_average"),
+        "vote_count": movie_data.get("vote_count"),
+        "poster_path": movie_data.get("poster_path"),
+        "backdrop_path": movie_data.get("backdrop_path"),
+        # Store genres as JSON array; names resolved from the genre list, not per-movie details
+        "genres": [{"id": gid, "name": genre_map.get(gid)} for gid in genre_ids] or None,
+        "genre": ", ".join(genre_names) or None,
+        "runtime": None,
+        "budget": None,
+        "revenue": None,
+        "tagline": None,
+        "status": None,
+        "is_trending": calculate_is_trending(movie_data),
+        "is_underrated": calculate_is_underrated(movie_data),
+        "details_fetched_at": None,
+    }
     
-    if not movie:
-        movie = Movie(id=movie_id)
-        db.add(movie)
+    if details:
+        row["details_fetched_at"] = datetime.now(timezone.utc)
+        row["runtime"] = details.get("runtime")
+        row["budget"] = details.get("budget")
+        row["revenue"] = details.get("revenue")
+        row["tagline"] = details.get("tagline")
+        row["status"] = details.get("status")
+        
+        if details.get("genres"):
+            row["genres"] = [{"id": g.get("id"), "name": g.get("name")} for g in details.get("genres", [])]
+            genre_names = [g.get("name", "") for g in details.get("genres", [])]
+            row["genre"] = ", ".join(genre_names) if genre_names else None
+        
+        # Recalculate flags with full data
+        row["is_trending"] = calculate_is_trending(details)
+        row["is_underrated"] = calculate_is_underrated(details)
     
-    # Update basic fields from list data
-    movie.title = movie_data.get("title") or movie_data.get("original_title") or ""
-    movie.release_date = parse_date(movie_data.get("release_date"))
-    movie.overview = movie_data.get("overview")
-    movie.popularity = movie_data.get("popularity")
-    movie.rating = movie_data.get("vote_average")
-    movie.vote_count = movie_data.get("vote_count")
-    movie.poster_path = movie_data.get("poster_path")
-    movie.backdrop_path = movie_data.get("backdrop_path")
+    return row
+
+
+def create_staging_table(db):
+    """Create a per-transaction movies_staging table (temp, so concurrent ingests never share it)"""
+    db.execute(text(
+        f"CREATE TEMP TABLE movies_staging ON COMMIT DROP AS "
+        f"SELECT {', '.join(STAGING_COLUMNS)} FROM movies WITH NO DATA"
+    ))
+    # Load order, so the newest copy of a movie wins the merge
+    db.execute(text("ALTER TABLE movies_staging ADD COLUMN seq bigserial"))
+
+
+def _staging_value(value):
+    if value is None:
+        return STAGING_NULL
+    if isinstance(value, (list, dict)):
+        return orjson.dumps(value).decode()
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def copy_to_staging(db, rows):
+    """Stream rows into movies_staging with a single COPY"""
+    if not rows:
+        return 0
     
-    # Handle genres - store as JSON array
-    genre_ids = movie_data.get("genre_ids", [])
-    if genre_ids:
-        genres_list = [{"id": gid} for gid in genre_ids]
-        movie.genres = genres_list
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        writer.writerow([_staging_value(row[name]) for name in STAGING_COLUMNS])
+    buf.seek(0)
     
-    movie.is_trending = calculate_is_trending(movie_data)
-    movie.is_underrated = calculate_is_underrated(movie_data)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY movies_staging ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv, NULL '{STAGING_NULL}')",
+            buf,
+        )
+    finally:
+        cursor.close()
+    return len(rows)
+
+
+def merge_staging(db):
+    """Merge movies_staging into movies with one INSERT ... SELECT ... ON CONFLICT"""
+    staging = table("movies_staging", *[column(name) for name in STAGING_COLUMNS + ["seq"]])
+    # ON CONFLICT cannot affect the same row twice within one statement
+    latest = (
+        select(*[staging.c[name] for name in STAGING_COLUMNS])
+        .distinct(staging.c.id)
+        .order_by(staging.c.id, staging.c.seq.desc())
+    )
     
-    if fetch_details:
-        details, credits = get_movie_details(movie_id)
-        if details:
-            movie.runtime = details.get("runtime")
-            movie.budget = details.get("budget")
-            movie.revenue = details.get("revenue")
-            movie.tagline = details.get("tagline")
-            movie.status = details.get("status")
-            
-            if details.get("genres"):
-                movie.genres = [{"id": g.get("id"), "name": g.get("name")} for g in details.get("genres", [])]
-                genre_names = [g.get("name", "") for g in details.get("genres", [])]
-                movie.genre = ", ".join(genre_names) if genre_names else None
-            
-            # Recalculate flags with full data
-            movie.is_trending = calculate_is_trending(details)
-            movie.is_underrated = calculate_is_underrated(details)
+    stmt = insert(Movie).from_select(STAGING_COLUMNS, latest)
+    set_ = {}
+    for name in STAGING_COLUMNS:
+        if name == "id":
+            continue
+        if name in DETAIL_COLUMNS:
+            # Keep previously fetched details when this batch has none
+            set_[name] = func.coalesce(stmt.excluded[name], Movie.__table__.c[name])
+        else:
+            set_[name] = stmt.excluded[name]
+    set_["updated_at"] = func.now()
     
-    return movie
+    return db.execute(stmt.on_conflict_do_update(index_elements=[Movie.id], set_=set_)).rowcount
+
+
+def fresh_detail_ids(db, movie_ids):
+    """Ids among movie_ids whose stored details are recent enough to skip refetching"""
+    if not movie_ids:
+        return set()
+    # Not updated_at: every upsert bumps it, details or not
+    rows = db.execute(
+        select(Movie.id).where(
+            Movie.id.in_(movie_ids),
+            Movie.details_fetched_at > func.now() - DETAILS_MAX_AGE,
+        )
+    ).scalars()
+    return set(rows)
 
 
 def get_movie_details(movie_id):
-    """Fetch full movie details from TMDB"""
-    data = tmdb_get(f"/movie/{movie_id}", {"language": "en-US"})
-    if not data:
-        return None, None
+    """Fetch full movie details from TMDB, through a Redis cache shared by all ingest runs"""
+    key = f"tmdb:movie:{movie_id}:v1"
+    details = get_from_cache(key)
+    if details is None:
+        details = tmdb_get(f"/movie/{movie_id}", {"language": "en-US"})
+        if details is not None:
+            set_in_cache(key, details, int(DETAILS_MAX_AGE.total_seconds()))
+    return details
+
+
+def get_movie_details_batch(movie_ids):
+    """Fetch details for many movies concurrently; returns {movie_id: details}"""
+    if not movie_ids:
+        return {}
     
-    credits = tmdb_get(f"/movie/{movie_id}/credits", {"language": "en-US"})
-    return data, credits
+    with ThreadPoolExecutor(max_workers=min(TMDB_MAX_CONCURRENCY, len(movie_ids))) as executor:
+        return dict(zip(movie_ids, executor.map(get_movie_details, movie_ids)))
 
 
 @celery_app.task(name="ingest.genres", bind=True)
 def ingest_genres(self: Task):
     try:
-        db = SessionLocal()
-        gdata = tmdb_get("/genre/movie/list", {"language": "en-US"})
+        genre_map = get_genre_map(refresh=True)
         
-        if not gdata or "genres" not in gdata:
-            db.close()
+        if not genre_map:
             return {"status": "error", "message": "Failed to fetch genres"}
         
-        genre_count = len(gdata["genres"])
-        db.close()
         return {
             "status": "success",
-            "genres_fetched": genre_count,
+            "genres_fetched": len(genre_map),
         }
     except Exception as e:
         return {"status": "error", "message": str(e)}
@@ -158,104 +327,87 @@ def ingest_upcoming(self: Task, pages: int = 5):
 
 @celery_app.task(name="ingest.trending", bind=True)
 def ingest_trending(self: Task, pages: int = 5):
-    db = SessionLocal()
-    total = 0
-    
-    try:
-        for page in range(1, pages + 1):
-            data = tmdb_get("/trending/movie/week", {"page": page, "language": "en-US"})
-            
-            if not data or "results" not in data:
-                break
-            
-            for movie_data in data["results"]:
-                try:
-                    movie = process_movie(movie_data, db, fetch_details=True)
-                    if movie:
-                        movie.is_trending = True
-                        total += 1
-                except Exception as e:
-                    continue
-            
-            db.commit()
-            time.sleep(0.5)
-        
-        db.close()
-        return {
-            "status": "success",
-            "movies_fetched": total,
-        }
-    except Exception as e:
-        db.rollback()
-        db.close()
-        return {"status": "error", "message": str(e)}
+    return ingest_pages("/trending/movie/week", pages, fetch_details=True, overrides={"is_trending": True})
 
 
 @celery_app.task(name="ingest.discover", bind=True)
 def ingest_discover(self: Task, sort_by: str = "popularity.desc", pages: int = 5):
-    db = SessionLocal()
-    total_movies = 0
-    
-    try:
-        for page in range(1, pages + 1):
-            data = tmdb_get("/discover/movie", {
-                "page": page,
-                "language": "en-US",
-                "sort_by": sort_by,
-                "vote_count.gte": 50
-            })
-            
-            if not data or "results" not in data:
-                break
-            
-            for movie_data in data["results"]:
-                try:
-                    process_movie(movie_data, db, fetch_details=True)
-                    total_movies += 1
-                except Exception:
-                    continue
-            
-            db.commit()
-            time.sleep(0.5)
-        
-        db.close()
-        return {
-            "status": "success",
-            "movies_fetched": total_movies,
-            "sort_by": sort_by,
-        }
-    except Exception as e:
-        db.rollback()
-        db.close()
-        return {"status": "error", "message": str(e)}
+    result = ingest_pages("/discover/movie", pages, fetch_details=True, params={
+        "sort_by": sort_by,
+        "vote_count.gte": 50
+    })
+    if result["status"] == "success":
+        result["sort_by"] = sort_by
+    return result
 
 
 def ingest_endpoint(endpoint: str, pages: int, fetch_details: bool = True):
-    """Helper function to fetch movies from a TMDB endpoint"""
+    """Helper function to fetch movies from a TMDB /movie/{endpoint} list"""
+    result = ingest_pages(f"/movie/{endpoint}", pages, fetch_details=fetch_details)
+    if result["status"] == "success":
+        result["endpoint"] = endpoint
+    return result
+
+
+def get_pages(path: str, pages: int, params=None):
+    """Fetch pages 1..pages concurrently (bounded by the shared rate limiter); results keep page order"""
+    def fetch(page):
+        return tmdb_get(path, {"page": page, "language": "en-US", **(params or {})})
+    
+    if pages < 1:
+        return []
+    with ThreadPoolExecutor(max_workers=min(TMDB_MAX_CONCURRENCY, pages)) as executor:
+        return list(executor.map(fetch, range(1, pages + 1)))
+
+
+def ingest_pages(path: str, pages: int, params=None, fetch_details: bool = True, overrides=None):
+    """Fetch paged TMDB results, COPY them into staging and merge into movies once
+    
+    Genre names come from the cached genre list. With fetch_details, runtime/budget/
+    revenue/tagline/status are fetched only for movies whose stored details are
+    missing or older than DETAILS_MAX_AGE, through the Redis details cache.
+    """
     db = SessionLocal()
-    total_movies = 0
     
     try:
-        for page in range(1, pages + 1):
-            data = tmdb_get(f"/movie/{endpoint}", {"page": page, "language": "en-US"})
-            
+        genre_map = get_genre_map()
+        create_staging_table(db)
+        
+        for data in get_pages(path, pages, params):
             if not data or "results" not in data:
                 break
             
-            for movie_data in data["results"]:
+            results = [m for m in data["results"] if m.get("id")]
+            
+            # Overlap the per-movie detail requests; DB writes stay on this thread
+            details_by_id = {}
+            if fetch_details:
+                fresh = fresh_detail_ids(db, [m["id"] for m in results])
+                details_by_id = get_movie_details_batch([m["id"] for m in results if m["id"] not in fresh])
+            
+            rows = []
+            for movie_data in results:
                 try:
-                    process_movie(movie_data, db, fetch_details=fetch_details)
-                    total_movies += 1
+                    row = movie_data_to_row(movie_data, details_by_id.get(movie_data["id"]), genre_map)
+                    if overrides:
+                        row.update(overrides)
+                    rows.append(row)
                 except Exception:
                     continue
             
-            db.commit()
-            time.sleep(0.5)
+            copy_to_staging(db, rows)
         
+        total_movies = merge_staging(db)
+        db.commit()
         db.close()
+        
+        # Cached listings and analytics fallbacks are now stale
+        delete_pattern_from_cache("movies:*")
+        delete_pattern_from_cache("analytics:*")
+        refresh_analytics_views.delay()
+        
         return {
             "status": "success",
-            "endpoint": endpoint,
             "movies_fetched": total_movies,
         }
     except Exception as e:
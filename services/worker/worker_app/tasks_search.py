@@ -1,90 +1,269 @@
+import gzip
+import hashlib
 import os
-from typing import List, Dict, Any
-from celery import Task
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from itertools import chain, islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import orjson
+import requests
+from celery import Task, chord
 from meilisearch import Client
-from meilisearch.errors import MeilisearchError
+from meilisearch.errors import MeilisearchApiError, MeilisearchTimeoutError
+from meilisearch.index import Index
+from sqlalchemy import Integer, Text, cast, extract, func, literal, literal_column, select
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from .celery_app import celery_app
-from services.api.app.db import SessionLocal
+from services.api.app.cache import get_redis_client
+from services.api.app.db import session_scope
 from services.api.app.models import Movie
 
 
+# Cap on hits Meilisearch counts/ranks per query; keep in step with routers/search.py
+SEARCH_MAX_TOTAL_HITS = 1000
+# Documents per add_documents request, and rows per fetch when streaming the movies table
+INDEX_BATCH_SIZE = 10_000
+DB_FETCH_SIZE = 5_000
+# Batch uploads allowed in flight while the next batch is read from Postgres
+UPLOAD_CONCURRENCY = 4
+
+
+MEILI_URL = os.getenv("MEILI_URL", "http://meilisearch:7700")
+MEILI_MASTER_KEY = os.getenv("MEILI_MASTER_KEY", "dev_master_key")
+
+
+INDEX_NAME = "movies"
+
+# Applied as one update_settings call: one Meilisearch task and one reindex instead of one per setting
+INDEX_SETTINGS = {
+    "searchableAttributes": ["title", "overview", "genres"],
+    "filterableAttributes": ["release_year", "genres", "vote_average", "vote_count", "popularity"],
+    "sortableAttributes": ["release_year", "vote_average", "vote_count", "popularity"],
+    "pagination": {"maxTotalHits": SEARCH_MAX_TOTAL_HITS},
+}
+
+_client: Optional[Client] = None
+_client_lock = threading.Lock()
+_index: Optional[Index] = None
+_index_lock = threading.Lock()
+
+
 def get_meilisearch_client() -> Client:
-    meili_url = os.getenv("MEILI_URL", "http://meilisearch:7700")
-    meili_key = os.getenv("MEILI_MASTER_KEY", "dev_master_key")
-    return Client(meili_url, meili_key)
+    """Meilisearch client shared by every task in this worker process"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = Client(MEILI_URL, MEILI_MASTER_KEY)
+    return _client
+
+
+def get_movies_index(client: Client) -> Index:
+    """Movies index handle, created and configured on first use in this worker process"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            index = client.index(INDEX_NAME)
+            try:
+                index.fetch_info()
+            except MeilisearchApiError as e:
+                if e.code != "index_not_found":
+                    raise
+                # create_index only enqueues a task; settings updates queue up behind it
+                client.create_index(INDEX_NAME, {"primaryKey": "id"})
+                index.update_settings(INDEX_SETTINGS)
+                # Hashes of documents in a previous index would make every upload look redundant
+                get_redis_client().delete(DOCUMENT_HASHES_KEY)
+            _index = index
+        return _index
+
+
+# Search documents shaped in the SELECT itself: defaults, release year and genre
+# names are computed by Postgres, so each row maps straight onto a document
+SEARCH_DOCUMENT_COLUMNS = (
+    Movie.id.label("id"),
+    func.coalesce(Movie.title, "").label("title"),
+    func.coalesce(Movie.overview, "").label("overview"),
+    cast(extract("year", Movie.release_date), Integer).label("release_year"),
+    func.coalesce(
+        func.jsonb_path_query_array(Movie.genres, literal_column("'$[*].name'::jsonpath"), type_=JSONB),
+        literal_column("'[]'::jsonb", JSONB),
+    ).label("genres"),
+    Movie.rating.label("vote_average"),
+    func.coalesce(Movie.vote_count, 0).label("vote_count"),
+    Movie.popularity.label("popularity"),
+)
+
+# Each document as one JSON text, ready to join into an NDJSON upload body
+SEARCH_DOCUMENT_JSON = cast(
+    func.jsonb_build_object(*chain.from_iterable(
+        (literal_column(f"'{column.name}'"), column.element) for column in SEARCH_DOCUMENT_COLUMNS
+    )),
+    Text,
+)
+
+# Level 1 already shrinks the repetitive field names several-fold at little CPU cost
+UPLOAD_COMPRESS_LEVEL = 1
+
+_upload_session = requests.Session()
+_upload_session.headers.update({
+    "Authorization": f"Bearer {MEILI_MASTER_KEY}",
+    "Content-Type": "application/x-ndjson",
+    "Content-Encoding": "gzip",
+})
+
+
+# Content hash of the last document uploaded per movie id; unchanged documents are not re-sent
+DOCUMENT_HASHES_KEY = "meili:hash"
+# How long an upload waits for its Meilisearch task before leaving its hashes unrecorded
+UPLOAD_CONFIRM_TIMEOUT_MS = 120_000
+
+
+def batched(items: Iterable, size: int) -> Iterator[List]:
+    """Consecutive lists of up to size items"""
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def upload_documents(documents: List[str]) -> int:
+    """Add JSON documents to the movies index as one gzipped NDJSON request; returns the task uid"""
+    body = gzip.compress("\n".join(documents).encode(), compresslevel=UPLOAD_COMPRESS_LEVEL)
+    response = _upload_session.post(f"{MEILI_URL}/indexes/{INDEX_NAME}/documents", data=body, timeout=60)
+    response.raise_for_status()
+    return orjson.loads(response.content)["taskUid"]
+
+
+def changed_documents(batch: List[Tuple[int, str]], force: bool = False) -> Tuple[List[str], Dict[int, bytes]]:
+    """Documents of (id, document) rows whose content differs from the last upload, with their new hashes
+
+    With force every document is returned, so stored hashes are refreshed but never trusted.
+    """
+    stored = [None] * len(batch) if force else get_redis_client().hmget(
+        DOCUMENT_HASHES_KEY, [movie_id for movie_id, _ in batch]
+    )
+    documents = []
+    digests = {}
+    for (movie_id, document), previous in zip(batch, stored):
+        # jsonb text has a canonical key order, so equal documents hash equally
+        digest = hashlib.blake2b(document.encode(), digest_size=16).digest()
+        if digest != previous:
+            documents.append(document)
+            digests[movie_id] = digest
+    return documents, digests
+
+
+def upload_and_record(documents: List[str], digests: Dict[int, bytes]) -> int:
+    """Upload a batch and record its hashes once Meilisearch reports the task succeeded
+
+    An accepted POST only means the task was enqueued; hashes of a failed or
+    unconfirmed task are left out so those documents are sent again next time.
+    """
+    task_uid = upload_documents(documents)
+    try:
+        task = get_meilisearch_client().wait_for_task(
+            task_uid, timeout_in_ms=UPLOAD_CONFIRM_TIMEOUT_MS, interval_in_ms=500
+        )
+    except MeilisearchTimeoutError:
+        return task_uid
+    if task.status == "succeeded":
+        get_redis_client().hset(DOCUMENT_HASHES_KEY, mapping=digests)
+    return task_uid
+
 
+def upload_in_batches(rows: Iterable[Tuple[int, str]], force: bool = False) -> Tuple[int, int, List[int]]:
+    """Upload changed (id, document) rows (every row with force) in INDEX_BATCH_SIZE batches
 
-def movie_to_search_document(movie: Movie) -> Dict[str, Any]:
-    release_year = None
-    if movie.release_date:
-        release_year = movie.release_date.year
+    Batches are posted from a small thread pool while the next one is read,
+    with at most UPLOAD_CONCURRENCY uploads in flight so memory stays bounded.
+    Returns (documents uploaded, documents skipped as unchanged, task uids in batch order).
+    """
+    task_uids = []
+    pending = deque()
+    movies_indexed = 0
+    skipped = 0
+    with ThreadPoolExecutor(max_workers=UPLOAD_CONCURRENCY) as executor:
+        for batch in batched(rows, INDEX_BATCH_SIZE):
+            documents, digests = changed_documents(batch, force)
+            skipped += len(batch) - len(documents)
+            if not documents:
+                continue
+            if len(pending) >= UPLOAD_CONCURRENCY:
+                task_uids.append(pending.popleft().result())
+            pending.append(executor.submit(upload_and_record, documents, digests))
+            movies_indexed += len(documents)
+        for future in pending:
+            task_uids.append(future.result())
+    return movies_indexed, skipped, task_uids
+
+
+# Start time of the last completed full or delta index run (ISO 8601)
+LAST_INDEXED_KEY = "meili:last_indexed_at"
+# Delta runs re-read this far behind the watermark: movies.updated_at is the writing
+# transaction's start time, and a transaction may commit up to task_time_limit later
+WATERMARK_OVERLAP = timedelta(minutes=30)
+
+
+def index_movies(since: datetime) -> Tuple[int, int, List[int]]:
+    """Upload movies changed after since; returns upload_in_batches' (uploaded, skipped, task uids)"""
+    statement = (
+        select(Movie.id, SEARCH_DOCUMENT_JSON)
+        .where(Movie.updated_at > since - WATERMARK_OVERLAP)
+        .execution_options(yield_per=DB_FETCH_SIZE)
+    )
     
-    genre_names = []
-    if movie.genres and isinstance(movie.genres, list):
-        for genre in movie.genres:
-            if isinstance(genre, dict) and "name" in genre:
-                genre_names.append(genre["name"])
+    with session_scope() as db:
+        started_at = db.scalar(select(func.now()))
+        result = upload_in_batches(db.execute(statement))
     
-    return {
-        "id": movie.id,
-        "title": movie.title or "",
-        "overview": movie.overview or "",
-        "release_year": release_year,
-        "genres": genre_names,
-        "vote_average": movie.rating,
-        "vote_count": movie.vote_count or 0,
-        "popularity": movie.popularity,
-    }
+    get_redis_client().set(LAST_INDEXED_KEY, started_at.isoformat())
+    return result
+
+
+# Movie ids per search.bulk_index shard of a full rebuild
+INDEX_SHARD_SIZE = 10_000
 
 
 @celery_app.task(name="search.build_index", bind=True)
 def build_search_index(self: Task):
-    db = SessionLocal()
+    """Fan a full rebuild out over workers as bulk_index_movies shards"""
     client = get_meilisearch_client()
-    index_name = "movies"
     
     try:
-        movies = db.query(Movie).all()
+        index = get_movies_index(client)
+        
+        # Applied on every full build so indexes created before the cap pick it up too
+        index.update_pagination_settings({"maxTotalHits": SEARCH_MAX_TOTAL_HITS})
         
-        if not movies:
+        with session_scope() as db:
+            started_at = db.scalar(select(func.now()))
+            ids = db.scalars(
+                select(Movie.id).order_by(Movie.id).execution_options(yield_per=DB_FETCH_SIZE)
+            ).all()
+        
+        if not ids:
             return {
                 "status": "error",
                 "message": "No movies found in database",
                 "movies_indexed": 0,
             }
         
-        documents = [movie_to_search_document(movie) for movie in movies]
-        
-        try:
-            index = client.get_index(index_name)
-        except MeilisearchError:
-            index = client.create_index(index_name, {"primaryKey": "id"})
-            index.update_searchable_attributes(["title", "overview", "genres"])
-            index.update_filterable_attributes([
-                "release_year",
-                "genres",
-                "vote_average",
-                "vote_count",
-                "popularity",
-            ])
-            index.update_sortable_attributes([
-                "release_year",
-                "vote_average",
-                "vote_count",
-                "popularity",
-            ])
-        
-        task_info = index.add_documents(documents)
-        
-        db.close()
+        shards = [ids[i:i + INDEX_SHARD_SIZE] for i in range(0, len(ids), INDEX_SHARD_SIZE)]
+        # The watermark only moves once every shard has reported back
+        # force: a full rebuild re-sends everything, so lost or failed uploads heal here
+        job = chord([bulk_index_movies.s(shard, force=True) for shard in shards])(
+            finish_build_index.s(started_at.isoformat())
+        )
         
         return {
             "status": "success",
-            "movies_indexed": len(documents),
-            "task_uid": task_info.task_uid,
+            "movies_queued": len(ids),
+            "shards": len(shards),
+            "job_id": job.id,
         }
     except Exception as e:
-        db.close()
         return {
             "status": "error",
             "message": str(e),
@@ -92,44 +271,55 @@ def build_search_index(self: Task):
         }
 
 
+@celery_app.task(name="search.finish_build_index")
+def finish_build_index(results: List[dict], started_at: str):
+    """Chord callback of build_search_index; records the watermark if every shard succeeded"""
+    failed = [result for result in results if result.get("status") != "success"]
+    if failed:
+        return {
+            "status": "error",
+            "message": f"{len(failed)} of {len(results)} shards failed: {failed[0].get('message')}",
+            "movies_indexed": sum(result.get("movies_indexed", 0) for result in results),
+        }
+    
+    get_redis_client().set(LAST_INDEXED_KEY, started_at)
+    return {
+        "status": "success",
+        "movies_indexed": sum(result["movies_indexed"] for result in results),
+        "skipped": sum(result["skipped"] for result in results),
+        "shards": len(results),
+    }
+
+
+# Single-movie index requests are coalesced: ids collect in a Redis set and one
+# delayed flush indexes them with a single add_documents call
+PENDING_KEY = "meili:pending"
+FLUSH_SCHEDULED_KEY = "meili:flush_scheduled"
+FLUSH_DELAY = 2
+FLUSH_BATCH_SIZE = 5000
+# Back-off before a flush retries ids whose upload failed
+FLUSH_RETRY_DELAY = 30
+
+
+def queue_for_index(movie_ids: List[int], delay: int = FLUSH_DELAY):
+    """Add ids to the pending set and schedule a flush unless one is already due"""
+    redis_client = get_redis_client()
+    redis_client.sadd(PENDING_KEY, *movie_ids)
+    # Only the first request in a window schedules the flush
+    if redis_client.set(FLUSH_SCHEDULED_KEY, 1, nx=True, ex=delay * 5):
+        flush_pending_index.apply_async(countdown=delay)
+
+
 @celery_app.task(name="search.index_movie", bind=True)
 def index_movie_in_meilisearch(self: Task, movie_id: int):
-    db = SessionLocal()
-    client = get_meilisearch_client()
-    index_name = "movies"
-    
     try:
-        movie = db.query(Movie).filter(Movie.id == movie_id).first()
-        
-        if not movie:
-            db.close()
-            return {
-                "status": "error",
-                "message": f"Movie {movie_id} not found",
-                "movie_id": movie_id,
-            }
-        
-        document = movie_to_search_document(movie)
-        
-        try:
-            index = client.get_index(index_name)
-        except MeilisearchError:
-            index = client.create_index(index_name, {"primaryKey": "id"})
-            index.update_searchable_attributes(["title", "overview", "genres"])
-            index.update_filterable_attributes(["release_year", "genres", "vote_average", "vote_count", "popularity"])
-            index.update_sortable_attributes(["release_year", "vote_average", "vote_count", "popularity"])
-        
-        task_info = index.add_documents([document])
-        
-        db.close()
+        queue_for_index([movie_id])
         
         return {
-            "status": "success",
+            "status": "queued",
             "movie_id": movie_id,
-            "task_uid": task_info.task_uid,
         }
     except Exception as e:
-        db.close()
         return {
             "status": "error",
             "message": str(e),
@@ -137,44 +327,93 @@ def index_movie_in_meilisearch(self: Task, movie_id: int):
         }
 
 
-@celery_app.task(name="search.bulk_index", bind=True)
-def bulk_index_movies(self: Task, movie_ids: List[int]):
-    db = SessionLocal()
-    client = get_meilisearch_client()
-    index_name = "movies"
+@celery_app.task(name="search.flush_pending", bind=True)
+def flush_pending_index(self: Task):
+    try:
+        redis_client = get_redis_client()
+        # Cleared before popping, so ids added from here on schedule a new flush
+        redis_client.delete(FLUSH_SCHEDULED_KEY)
+        movie_ids = [int(movie_id) for movie_id in redis_client.spop(PENDING_KEY, FLUSH_BATCH_SIZE) or []]
+        if redis_client.scard(PENDING_KEY):
+            flush_pending_index.delay()
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": str(e),
+            "movies_indexed": 0,
+        }
+    
+    if not movie_ids:
+        return {
+            "status": "success",
+            "movies_indexed": 0,
+        }
+    
+    try:
+        movies_indexed, skipped, task_uids = index_movie_ids(movie_ids)
+    except Exception as e:
+        # SPOP already removed these ids; put them back so a later flush retries them
+        queue_for_index(movie_ids, delay=FLUSH_RETRY_DELAY)
+        return {
+            "status": "error",
+            "message": str(e),
+            "movies_indexed": 0,
+            "requeued": len(movie_ids),
+        }
+    
+    return {
+        "status": "success",
+        "movies_indexed": movies_indexed,
+        "skipped": skipped,
+        "task_uids": task_uids,
+    }
+
+
+def index_movie_ids(movie_ids: List[int], force: bool = False) -> Tuple[int, int, List[int]]:
+    """Upload the documents of movie_ids; returns upload_in_batches' (uploaded, skipped, task uids)"""
+    # Order-preserving dedupe; repeated ids would otherwise be read and sent twice
+    movie_ids = list(dict.fromkeys(movie_ids))
     
+    # Creates and configures the index on first use; the upload itself bypasses the client
+    get_movies_index(get_meilisearch_client())
+    
+    # Ids travel as one array parameter and are joined in request order,
+    # rather than expanding into an IN list with one bind per id
+    requested = (
+        func.unnest(cast(literal(movie_ids, ARRAY(Integer)), ARRAY(Integer)))
+        .table_valued("id", with_ordinality="position")
+        .render_derived(name="requested")
+    )
+    
+    with session_scope() as db:
+        return upload_in_batches(db.execute(
+            select(Movie.id, SEARCH_DOCUMENT_JSON)
+            .select_from(requested)
+            .join(Movie, Movie.id == requested.c.id)
+            .order_by(requested.c.position)
+            .execution_options(yield_per=DB_FETCH_SIZE)
+        ), force)
+
+
+@celery_app.task(name="search.bulk_index", bind=True)
+def bulk_index_movies(self: Task, movie_ids: List[int], force: bool = False):
     try:
-        movies = db.query(Movie).filter(Movie.id.in_(movie_ids)).all()
+        movies_indexed, skipped, task_uids = index_movie_ids(movie_ids, force)
         
-        if not movies:
-            db.close()
+        if not movies_indexed and not skipped:
             return {
                 "status": "error",
                 "message": "No movies found",
                 "movies_indexed": 0,
             }
         
-        documents = [movie_to_search_document(movie) for movie in movies]
-        
-        try:
-            index = client.get_index(index_name)
-        except MeilisearchError:
-            index = client.create_index(index_name, {"primaryKey": "id"})
-            index.update_searchable_attributes(["title", "overview", "genres"])
-            index.update_filterable_attributes(["release_year", "genres", "vote_average", "vote_count", "popularity"])
-            index.update_sortable_attributes(["release_year", "vote_average", "vote_count", "popularity"])
-        
-        task_info = index.add_documents(documents)
-        
-        db.close()
-        
         return {
             "status": "success",
-            "movies_indexed": len(documents),
-            "task_uid": task_info.task_uid,
+            "movies_indexed": movies_indexed,
+            "skipped": skipped,
+            "task_uids": task_uids,
         }
     except Exception as e:
-        db.close()
         return {
             "status": "error",
             "message": str(e),
@@ -184,5 +423,25 @@ def bulk_index_movies(self: Task, movie_ids: List[int]):
 
 @celery_app.task(name="search.update_index", bind=True)
 def update_search_index(self: Task):
-    return build_search_index()
+    """Index only movies updated since the last run; falls back to a full build without a watermark"""
+    try:
+        last_indexed_at = get_redis_client().get(LAST_INDEXED_KEY)
+        if last_indexed_at is None:
+            return build_search_index()
+        
+        get_movies_index(get_meilisearch_client())
+        movies_indexed, skipped, task_uids = index_movies(datetime.fromisoformat(last_indexed_at.decode()))
+        
+        return {
+            "status": "success",
+            "movies_indexed": movies_indexed,
+            "skipped": skipped,
+            "task_uids": task_uids,
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": str(e),
+            "movies_indexed": 0,
+        }
 
@@ -0,0 +1,54 @@
+"""
+Unit tests for the middleware latency histogram
+"""
+import pytest
+from services.api.app.middleware import LatencyHistogram, N_BUCKETS
+
+
+class TestLatencyHistogram:
+    """Test histogram-based latency stats"""
+    
+    def test_empty_histogram(self):
+        """Test a fresh histogram has no samples"""
+        hist = LatencyHistogram()
+        assert hist.count == 0
+        assert hist.buckets.shape == (N_BUCKETS + 1,)
+    
+    def test_running_scalars(self):
+        """Test count/min/max/total are exact"""
+        hist = LatencyHistogram()
+        for latency in [5.0, 1.0, 20.0, 4.0]:
+            hist.record(latency)
+        assert hist.count == 4
+        assert hist.min == 1.0
+        assert hist.max == 20.0
+        assert hist.total == pytest.approx(30.0)
+    
+    def test_percentiles_within_bucket_resolution(self):
+        """Test p50/p95 land within one log bucket of the true value"""
+        hist = LatencyHistogram()
+        latencies = [float(i) for i in range(1, 1001)]
+        for latency in latencies:
+            hist.record(latency)
+        # Adjacent edges are ~11% apart
+        assert hist.percentile(0.5) == pytest.approx(latencies[500], rel=0.12)
+        assert hist.percentile(0.95) == pytest.approx(latencies[950], rel=0.12)
+    
+    def test_percentile_clamped_to_observed_range(self):
+        """Test a single sample reports itself, including beyond the last edge"""
+        for latency in [3.3, 120000.0]:
+            hist = LatencyHistogram()
+            hist.record(latency)
+            assert hist.percentile(0.5) == latency
+            assert hist.percentile(0.95) == latency
+    
+    def test_merge(self):
+        """Test merging combines counts and extremes"""
+        a, b = LatencyHistogram(), LatencyHistogram()
+        a.record(2.0)
+        b.record(50.0)
+        a.merge(b)
+        assert a.count == 2
+        assert a.min == 2.0
+        assert a.max == 50.0
+        assert int(a.buckets.sum()) == 2
@@ -15,9 +15,9 @@ def calculate_recommendation_score(
     
     Score = (genre_overlap_ratio * 0.5) + (rating_similarity * 0.5)
     """
-    # Calculate genre overlap
+    # Calculate genre overlap; the union size follows from it, as in top_recommendations
     overlap = len(movie_genre_ids & other_genre_ids)
-    total_genres = len(movie_genre_ids | other_genre_ids)
+    total_genres = len(movie_genre_ids) + len(other_genre_ids) - overlap
     genre_score = overlap / total_genres if total_genres > 0 else 0
     
     # Calculate rating similarity (normalized difference)